@@ -4,7 +4,7 @@ import { Textarea } from './ui/textarea';
 import { Badge } from './ui/badge';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from './ui/select';
 import { ArrowLeft, Upload, Wand2, Eye, Copy, Download, Loader2, FileText, Zap, CheckCircle, Settings } from 'lucide-react';
-import { selectionOptions, getPromptForTool } from '../utils/prompts';
+import { selectionOptions, buildSystemPrompt } from '../utils/prompts';
 
 export const ToolPage = ({ tool, onNavigate }) => {
   const [input, setInput] = useState('');
@@ -65,8 +65,8 @@ export const ToolPage = ({ tool, onNavigate }) => {
 
     setIsLoading(true);
     
-    // Get the predefined prompt for this tool (null for analysis tools)
-    const systemPrompt = getPromptForTool(tool.id, {
+    // The system prompt the function app will send (null for analysis tools)
+    const systemPrompt = buildSystemPrompt(tool.id, {
       selectedLanguage,
       selectedTone,
       selectedLength,
@@ -92,10 +92,17 @@ export const ToolPage = ({ tool, onNavigate }) => {
         headers: { 
           'Content-Type': 'application/json' 
         },
-        body: JSON.stringify({ 
+        // The function app builds the system prompt from tool_id and options
+        body: JSON.stringify({
           text: input,
-          prompt: systemPrompt,
-          tool_id: tool.id
+          tool_id: tool.id,
+          options: {
+            language: selectedLanguage,
+            tone: selectedTone,
+            length: selectedLength,
+            voice: selectedVoice,
+            speech: selectedSpeech
+          }
         })
       });
 
@@ -1,5 +1,12 @@
 
 
+// Kept in step with prompts.py in the function app, which builds the system
+// prompt actually sent; tests/test_prompt_parity.py checks the two match.
+export const sharedPrefix =
+  "You are the writing assistant behind the Tools360 content tools. " +
+  "Apply the instruction below to the text in the user message only, " +
+  "and reply with the result without any preamble.";
+
 export const toolPrompts = {
   "proofreading":
     "Please proofread the following text and identify any spelling errors, grammatical mistakes, and style inconsistencies. Provide a corrected version with explanations for each change:",
@@ -163,3 +170,11 @@ export const getPromptForTool = (toolId, selections = {}) => {
       return toolPrompts[toolId] || "Please process the following text:";
   }
 };
+
+// The system prompt the function app sends for a registered tool, for display
+export const buildSystemPrompt = (toolId, selections = {}) => {
+  if (!(toolId in toolPrompts)) {
+    return null;
+  }
+  return `${sharedPrefix}\n\n${getPromptForTool(toolId, selections)}`;
+};
@@ -0,0 +1,333 @@
+# Micro-benchmarks for the text analyzers and the HTML renderer.
+#
+#   python benchmark.py                          # full run, 1 KB .. 50 MB
+#   python benchmark.py --sizes 1KB,1MB --save baseline.json
+#   python benchmark.py --compare baseline.json  # exit 1 on regression
+#   python benchmark.py --syllable-accuracy cmudict.dict
+#   python benchmark.py --syllable-speed --sizes 64KB,1MB
+#
+# Each function is timed on generated corpora of several shapes and sizes.
+# The report gives throughput (MB/s of input), median per-call latency and
+# peak traced memory for a single call. --syllable-accuracy instead scores the
+# syllable counter against the CMU Pronouncing Dictionary, on words held out
+# of the lexicon, and --syllable-speed times the analyzers with the lexicon
+# against the vowel-run counter it replaced.
+
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import function_app
+import syllables
+
+WORDS = (
+    "the of and to in is that it for was on are as with his they at be this "
+    "from have or by one had not but what all were when we there can an your "
+    "which their said if do will each about how up out them then she many some "
+    "so these would other into has more her two like him see time could no "
+    "make than first been its who now people my made over did down only way "
+    "find use may water long little very after words called just where most "
+    "know readability analysis paragraph syllable sentence beautiful queueing "
+    "rhythm extraordinary institutionalization"
+).split()
+
+CODE_LINES = [
+    "def handler(req):",
+    "    data = req.get_json()",
+    "    if not data.get('text', '').strip():",
+    "        return error_response(400)",
+    "for (let i = 0; i < items.length; i++) { total += items[i].value; }",
+    "SELECT id, title FROM articles WHERE updated_at > NOW() - INTERVAL '1 day';",
+    "    result = {k: v for k, v in zip(keys, values) if v is not None}",
+    "}",
+]
+
+def prose(rng, size):
+    parts = []
+    length = 0
+    while length < size:
+        sentence = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 30)))
+        sentence = sentence.capitalize() + rng.choice('...!?')
+        parts.append(sentence)
+        length += len(sentence) + 1
+        if rng.random() < 0.15:
+            parts.append('\n\n')
+    return ' '.join(parts)[:size]
+
+def code_heavy(rng, size):
+    parts = []
+    length = 0
+    while length < size:
+        if rng.random() < 0.3:
+            chunk = prose(rng, rng.randint(80, 400)) + '\n'
+        else:
+            chunk = '\n'.join(rng.choice(CODE_LINES) for _ in range(rng.randint(3, 12))) + '\n\n'
+        parts.append(chunk)
+        length += len(chunk)
+    return ''.join(parts)[:size]
+
+def no_punctuation(rng, size):
+    parts = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        parts.append(word)
+        length += len(word) + 1
+    return ' '.join(parts)[:size]
+
+def blank_lines(rng, size):
+    parts = []
+    length = 0
+    while length < size:
+        chunk = prose(rng, rng.randint(20, 120)) + '\n' * rng.randint(1, 6) + ' \t\n' * rng.randint(0, 3)
+        parts.append(chunk)
+        length += len(chunk)
+    return ''.join(parts)[:size]
+
+def rare_words(rng, size):
+    # Made-up words that are almost never repeated, so the per-word and
+    # per-chunk memos miss and the lexicon and rules do the work
+    parts = []
+    length = 0
+    while length < size:
+        word = ''.join(rng.choice('bcdfghlmnprstvw') + rng.choice('aeiouy') * rng.randint(1, 2) for _ in range(rng.randint(1, 5)))
+        parts.append(word + ('. ' if rng.random() < 0.08 else ' '))
+        length += len(parts[-1])
+    return ''.join(parts)[:size]
+
+CORPORA = {
+    'prose': prose,
+    'code': code_heavy,
+    'no-punctuation': no_punctuation,
+    'blank-lines': blank_lines,
+    'rare-words': rare_words,
+}
+
+def html_benchmark(tool_type):
+    def run(text):
+        data = function_app.ANALYZERS[tool_type](text)
+        return lambda: function_app.generate_html_response(data, tool_type, 'https://example.invalid/analyzer.css')
+    return run
+
+def text_benchmark(fn):
+    return lambda text: (lambda: fn(text))
+
+BENCHMARKS = {
+    'count_words': text_benchmark(function_app.count_words),
+    'count_sentences': text_benchmark(function_app.count_sentences),
+    'count_syllables': text_benchmark(function_app.count_syllables),
+    'count_paragraphs': text_benchmark(function_app.count_paragraphs),
+    'analyze_content': text_benchmark(function_app.analyze_content),
+    'analyze_readability': text_benchmark(function_app.analyze_readability),
+    'analyze_readability_detail': text_benchmark(lambda text: function_app.analyze_readability_detail([text])),
+    'generate_html_response[count-analyzer]': html_benchmark('count-analyzer'),
+    'generate_html_response[readability-score]': html_benchmark('readability-score'),
+}
+
+# Renderer cost does not depend on document size, so it is reported per call
+SIZE_INDEPENDENT = {name for name in BENCHMARKS if name.startswith('generate_html_response')}
+
+def parse_size(value):
+    units = {'KB': 1024, 'MB': 1024 * 1024, 'B': 1}
+    value = value.strip().upper()
+    for unit, factor in units.items():
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * factor)
+    return int(value)
+
+def time_call(call, min_time, max_repeats):
+    call()
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_repeats and (not samples or time.perf_counter() - started < min_time):
+        t0 = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples), len(samples)
+
+def peak_memory(call):
+    tracemalloc.start()
+    try:
+        call()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run(sizes, corpora, names, min_time, max_repeats, seed):
+    results = []
+    for corpus in corpora:
+        for size in sizes:
+            text = CORPORA[corpus](random.Random(seed), size)
+            for name in names:
+                if name in SIZE_INDEPENDENT and size != sizes[0]:
+                    continue
+                call = BENCHMARKS[name](text)
+                latency, repeats = time_call(call, min_time, max_repeats)
+                results.append({
+                    'function': name,
+                    'corpus': corpus,
+                    'size': len(text),
+                    'latency_ms': latency * 1000,
+                    'throughput_mb_s': None if name in SIZE_INDEPENDENT else len(text) / latency / 1e6,
+                    'peak_memory_kb': peak_memory(call) / 1024,
+                    'repeats': repeats,
+                })
+                report(results[-1])
+    return results
+
+def report(row):
+    throughput = f"{row['throughput_mb_s']:9.2f} MB/s" if row['throughput_mb_s'] is not None else ' ' * 14
+    print(
+        f"{row['function']:<42} {row['corpus']:<15} {row['size']:>10,} B "
+        f"{row['latency_ms']:11.3f} ms {throughput} {row['peak_memory_kb']:11.1f} KB peak"
+    )
+
+def result_key(row):
+    return f"{row['function']}|{row['corpus']}|{row['size']}"
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {result_key(row): row for row in json.load(f)['results']}
+
+    regressions = []
+    for row in results:
+        before = baseline.get(result_key(row))
+        if before is None:
+            continue
+        change = row['latency_ms'] / before['latency_ms'] - 1
+        memory_change = row['peak_memory_kb'] / max(before['peak_memory_kb'], 1) - 1
+        flag = change > threshold or memory_change > threshold
+        if flag:
+            regressions.append(row)
+        print(
+            f"{'REGRESSION' if flag else 'ok':<10} {result_key(row):<80} "
+            f"latency {change:+7.1%}  memory {memory_change:+7.1%}"
+        )
+    return regressions
+
+def legacy_syllables(word):
+    # The whole-text vowel-run count the analyzers used before the lexicon
+    return len(re.findall(r'[aeiouy]{1,2}', word))
+
+def score_syllables(name, counter, counts):
+    exact = within_one = 0
+    for word, count in counts.items():
+        error = abs(counter(word) - count)
+        exact += error == 0
+        within_one += error <= 1
+    print(f'{name:<20} exact {exact / len(counts):7.2%}   within one {within_one / len(counts):7.2%}')
+
+def syllable_accuracy(dictionary_path, seed, holdout=0.1):
+    # The shipped lexicon holds every dictionary word, so scoring it on the
+    # dictionary only shows that lookups work. Accuracy on unseen words is
+    # measured by building a lexicon without a random tenth of the
+    # dictionary and scoring on that tenth.
+    from build_syllable_lexicon import build_entries, read_dictionary
+    counts = read_dictionary(dictionary_path)
+    words = sorted(counts)
+    random.Random(seed).shuffle(words)
+    held_out = {word: counts[word] for word in words[:int(len(words) * holdout)]}
+    training = {word: counts[word] for word in words[len(held_out):]}
+
+    print(f'{len(counts):,} dictionary words; {len(held_out):,} held out of a lexicon of the other {len(training):,}\n')
+    print('held-out words:')
+    score_syllables('legacy vowel runs', legacy_syllables, held_out)
+    score_syllables('rules only', syllables.estimate_syllables, held_out)
+
+    shipped = syllables._offsets, syllables._hashes, syllables._counts
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'syllables.bin')
+        syllables.save_lexicon(build_entries(training)[0].items(), path)
+        syllables._offsets, syllables._hashes, syllables._counts = syllables.load_lexicon(path)
+    syllables.count_word_syllables.cache_clear()
+    try:
+        score_syllables('lexicon + rules', syllables.count_word_syllables, held_out)
+    finally:
+        syllables._offsets, syllables._hashes, syllables._counts = shipped
+        syllables.count_word_syllables.cache_clear()
+
+    print('\nall words, shipped lexicon (in-vocabulary, so this only checks lookups):')
+    score_syllables('lexicon + rules', syllables.count_word_syllables, counts)
+
+def clear_memos():
+    function_app._memo_chunk.cache_clear()
+    function_app._chunk_syllables.cache_clear()
+    syllables.count_word_syllables.cache_clear()
+
+def syllable_speed(sizes, min_time, max_repeats, seed):
+    # Prose is mostly dictionary words that repeat; on rare-words every word
+    # misses the lexicon and the memos, so it times the rules. Memos are
+    # cleared before every call so repeats do not turn into cache hits.
+    counters = {'legacy vowel runs': legacy_syllables, 'lexicon + rules': syllables.count_word_syllables}
+    shipped = function_app.count_word_syllables
+    try:
+        for corpus in ('prose', 'rare-words'):
+            for size in sizes:
+                text = CORPORA[corpus](random.Random(seed), size)
+                for name in ('count_syllables', 'analyze_readability'):
+                    fn = getattr(function_app, name)
+                    row = []
+                    for counter in counters.values():
+                        function_app.count_word_syllables = counter
+                        latency, _ = time_call(lambda: (clear_memos(), fn(text)), min_time, max_repeats)
+                        row.append(len(text) / latency / 1e6)
+                    print(
+                        f'{name:<20} {corpus:<11} {len(text):>10,} B   '
+                        + '   '.join(f'{label} {rate:7.2f} MB/s' for label, rate in zip(counters, row))
+                    )
+    finally:
+        function_app.count_word_syllables = shipped
+        clear_memos()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the text analyzers and HTML renderer.')
+    parser.add_argument('--sizes', default='1KB,64KB,1MB,8MB,50MB', help='comma-separated corpus sizes')
+    parser.add_argument('--corpora', default=','.join(CORPORA), help='comma-separated corpus shapes')
+    parser.add_argument('--functions', default=','.join(BENCHMARKS), help='comma-separated functions')
+    parser.add_argument('--min-time', type=float, default=0.5, help='minimum seconds spent timing each case')
+    parser.add_argument('--max-repeats', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare', help='compare against a saved JSON baseline')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed slowdown before flagging (0.10 = 10%%)')
+    parser.add_argument('--syllable-accuracy', metavar='CMUDICT', help='score syllable counting against cmudict.dict and exit')
+    parser.add_argument('--syllable-speed', action='store_true', help='time the lexicon against the legacy syllable counter and exit')
+    args = parser.parse_args(argv)
+
+    if args.syllable_accuracy:
+        syllable_accuracy(args.syllable_accuracy, args.seed)
+        return 0
+
+    sizes = [parse_size(size) for size in args.sizes.split(',')]
+    if args.syllable_speed:
+        syllable_speed(sizes, args.min_time, args.max_repeats, args.seed)
+        return 0
+    results = run(
+        sizes,
+        args.corpora.split(','),
+        args.functions.split(','),
+        args.min_time,
+        args.max_repeats,
+        args.seed
+    )
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version, 'results': results}, f, indent=2)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f'{len(regressions)} regression(s) above {args.threshold:.0%}')
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
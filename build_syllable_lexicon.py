@@ -0,0 +1,68 @@
+# Builds syllables.bin from the CMU Pronouncing Dictionary.
+#
+#   python build_syllable_lexicon.py cmudict.dict
+#
+# cmudict.dict ships in the `cmudict` package on PyPI (cmudict/data/) and at
+# https://github.com/cmusphinx/cmudict. The syllable count of a word is the
+# number of stressed phones (those ending in a digit) in its first
+# pronunciation. A word whose hash is shared with a dictionary word of a
+# different count is left out, so no dictionary word gets another's count;
+# those few words go through the rules instead. A word that is not in the
+# dictionary can still collide with one that is, and then gets its count.
+
+import argparse
+import re
+import sys
+from collections import defaultdict
+
+import syllables
+
+WORD_RE = re.compile(r"[a-z]+(?:'[a-z]+)*")
+
+def read_dictionary(path):
+    counts = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            fields = line.split('#', 1)[0].split()
+            if not fields:
+                continue
+            word = fields[0].lower()
+            # Alternative pronunciations are listed as word(2), word(3), ...
+            if '(' in word or not WORD_RE.fullmatch(word):
+                continue
+            counts.setdefault(word, sum(phone[-1].isdigit() for phone in fields[1:]))
+    return counts
+
+def build_entries(counts):
+    by_hash = defaultdict(set)
+    for word, count in counts.items():
+        by_hash[syllables.word_hash(word)].add(count)
+
+    entries = {}
+    dropped = 0
+    for word, count in counts.items():
+        h = syllables.word_hash(word)
+        if len(by_hash[h]) > 1:
+            dropped += 1
+            continue
+        entries[h] = count
+    return entries, dropped
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the packed syllable lexicon from cmudict.dict.')
+    parser.add_argument('dictionary', help='path to cmudict.dict')
+    parser.add_argument('--output', default=syllables.LEXICON_PATH)
+    args = parser.parse_args(argv)
+
+    counts = read_dictionary(args.dictionary)
+    entries, dropped = build_entries(counts)
+    syllables.save_lexicon(entries.items(), args.output)
+
+    print(
+        f'{len(counts):,} dictionary words, {len(entries):,} stored '
+        f'({len(entries) * 5 / 1024:.0f} KB), {dropped} left out for hash collisions'
+    )
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
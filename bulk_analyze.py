@@ -0,0 +1,271 @@
+# Offline bulk analysis over a JSONL corpus or a directory of text files.
+#
+#   python bulk_analyze.py archive.jsonl results.jsonl
+#   python bulk_analyze.py requests.jsonl out.jsonl --id-field request_id --text-field body
+#   python bulk_analyze.py articles/ results.parquet --pattern '*.md' --tool count-analyzer
+#   python bulk_analyze.py archive.jsonl results.jsonl --resume   # after an interrupted run
+#
+# Runs the same analyzers as the utilities route (ANALYZERS in function_app)
+# across a process pool without any HTTP invocations. Input is read lazily and
+# only a bounded window of chunks is in flight, so memory does not grow with
+# the corpus; files from a directory are streamed from disk inside the worker.
+# Results are written in input order, one row per document, as JSONL or (with
+# pyarrow installed) as a directory of Parquet part files. A checkpoint next to
+# the output records how many input records are durably written, and --resume
+# continues from there.
+
+import argparse
+import concurrent.futures
+import fnmatch
+import json
+import os
+import sys
+import time
+from collections import deque
+from itertools import islice
+
+import function_app
+
+def iter_jsonl_records(path, id_field, text_field, skip=0):
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line_number, line in enumerate(islice(f, skip, None), start=skip + 1):
+            if not line.strip():
+                yield ('error', str(line_number), 'Empty line.')
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield ('error', str(line_number), f'Invalid JSON: {e}')
+                continue
+            if not isinstance(record, dict):
+                yield ('error', str(line_number), 'Record must be an object.')
+                continue
+            record_id = record.get(id_field, line_number)
+            text = record.get(text_field)
+            if not isinstance(text, str):
+                yield ('error', str(record_id), f'Missing text field {text_field!r}.')
+                continue
+            yield ('text', str(record_id), text)
+
+def iter_directory_files(root, pattern):
+    # Sorted walk so that record order, and therefore --resume, is stable
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(files):
+            if fnmatch.fnmatch(name, pattern):
+                yield os.path.join(directory, name)
+
+def iter_directory_records(root, pattern, skip=0):
+    for path in islice(iter_directory_files(root, pattern), skip, None):
+        yield ('file', os.path.relpath(path, root), path)
+
+STREAM_ANALYZERS = {
+    'count-analyzer': function_app.analyze_content_stream,
+    'readability-score': function_app.analyze_readability_stream
+}
+
+def analyze_record(tool_id, record):
+    kind, record_id, payload = record
+    row = {'id': record_id, 'tool_id': tool_id, 'error': None}
+    if kind == 'error':
+        row['error'] = payload
+        return row
+    try:
+        if kind == 'file':
+            # Read in pieces inside the worker; large files never cross the pool
+            row.update(STREAM_ANALYZERS[tool_id](function_app.iter_file_text(payload)))
+        elif not payload.strip():
+            row['error'] = 'No text provided.'
+        else:
+            row.update(function_app.ANALYZERS[tool_id](payload))
+    except Exception as e:
+        row['error'] = str(e)
+    return row
+
+def analyze_chunk(job):
+    tool_id, records = job
+    return [analyze_record(tool_id, record) for record in records]
+
+def iter_chunks(records, size):
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+class JsonlSink:
+    def __init__(self, path, state=None):
+        self.path = path
+        if state:
+            self.file = open(path, 'r+b')
+            # Drop anything written after the last checkpoint
+            self.file.truncate(state['offset'])
+            self.file.seek(state['offset'])
+        else:
+            self.file = open(path, 'wb')
+
+    def write(self, rows):
+        self.file.write(''.join(json.dumps(row) + '\n' for row in rows).encode('utf-8'))
+        return True
+
+    def flush(self):
+        self.file.flush()
+
+    def state(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {'offset': self.file.tell()}
+
+    def close(self):
+        self.file.close()
+
+class ParquetSink:
+    # Parquet files cannot be appended to, so rows go to numbered part files
+    # in a directory; a checkpoint covers only the parts already closed.
+    def __init__(self, path, columns, rows_per_part, state=None):
+        import pyarrow
+        import pyarrow.parquet
+        self.pyarrow = pyarrow
+        self.parquet = pyarrow.parquet
+        self.path = path
+        self.columns = columns
+        self.rows_per_part = rows_per_part
+        self.parts = state['parts'] if state else 0
+        self.pending = []
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name.startswith('part-') and name.endswith('.parquet') and int(name[5:-8]) >= self.parts:
+                os.remove(os.path.join(path, name))
+
+    def write(self, rows):
+        self.pending.extend(rows)
+        if len(self.pending) < self.rows_per_part:
+            return False
+        self.flush()
+        return True
+
+    def flush(self):
+        if not self.pending:
+            return
+        # Fixed columns, so error rows cannot narrow the inferred schema
+        table = self.pyarrow.Table.from_pydict({
+            column: [row.get(column) for row in self.pending] for column in self.columns
+        })
+        self.parquet.write_table(table, os.path.join(self.path, f'part-{self.parts:05d}.parquet'))
+        self.parts += 1
+        self.pending = []
+
+    def state(self):
+        return {'parts': self.parts}
+
+    def close(self):
+        self.flush()
+
+def checkpoint_path(output):
+    return output.rstrip('/\\') + '.checkpoint.json'
+
+def load_checkpoint(output):
+    try:
+        with open(checkpoint_path(output), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def save_checkpoint(output, checkpoint):
+    path = checkpoint_path(output)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+    os.replace(path + '.tmp', path)
+
+def output_format(output, requested):
+    if requested:
+        return requested
+    return 'parquet' if output.endswith('.parquet') else 'jsonl'
+
+def result_columns(tool_id):
+    return ['id', 'tool_id', 'error', *function_app.ANALYZERS[tool_id]('Sample text.')]
+
+def open_sink(fmt, output, tool_id, rows_per_part, state):
+    if fmt == 'parquet':
+        return ParquetSink(output, result_columns(tool_id), rows_per_part, state)
+    return JsonlSink(output, state)
+
+def run(records, sink, tool_id, workers, chunk_size, done, on_checkpoint):
+    # At most two chunks per worker are queued; results are consumed in
+    # submission order so the output follows the input order.
+    window = workers * 2
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        inflight = deque()
+        chunks = iter_chunks(records, chunk_size)
+        while True:
+            while len(inflight) < window:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                inflight.append((len(chunk), pool.submit(analyze_chunk, (tool_id, chunk))))
+            if not inflight:
+                break
+            count, future = inflight.popleft()
+            rows = future.result()
+            done += count
+            if sink.write(rows):
+                on_checkpoint(done, sink.state())
+    sink.flush()
+    on_checkpoint(done, sink.state())
+    sink.close()
+    return done
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the text analyzers over a JSONL corpus or a directory of text files.')
+    parser.add_argument('input', help='JSONL file or directory of text files')
+    parser.add_argument('output', help='JSONL file, or Parquet directory when the name ends in .parquet')
+    parser.add_argument('--tool', default='readability-score', choices=sorted(function_app.ANALYZERS))
+    parser.add_argument('--format', choices=('jsonl', 'parquet'), help='output format (default: from the output name)')
+    parser.add_argument('--id-field', default='id', help='JSONL field used as the document id (default: line number)')
+    parser.add_argument('--text-field', default='text', help='JSONL field holding the document text')
+    parser.add_argument('--pattern', default='*.txt', help='file name pattern for directory input')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=256, help='documents per worker task')
+    parser.add_argument('--rows-per-part', type=int, default=100000, help='rows per Parquet part file')
+    parser.add_argument('--resume', action='store_true', help='continue from the checkpoint of an earlier run')
+    args = parser.parse_args(argv)
+
+    fmt = output_format(args.output, args.format)
+    if fmt == 'parquet':
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            parser.error('Parquet output needs pyarrow (pip install pyarrow)')
+
+    settings = {'input': os.path.abspath(args.input), 'tool': args.tool, 'format': fmt}
+    checkpoint = load_checkpoint(args.output) if args.resume else None
+    if checkpoint and checkpoint['settings'] != settings:
+        parser.error('the checkpoint was written with different input, tool or format settings')
+    done = checkpoint['records'] if checkpoint else 0
+
+    if os.path.isdir(args.input):
+        records = iter_directory_records(args.input, args.pattern, skip=done)
+    else:
+        records = iter_jsonl_records(args.input, args.id_field, args.text_field, skip=done)
+
+    sink = open_sink(fmt, args.output, args.tool, args.rows_per_part, checkpoint['sink'] if checkpoint else None)
+    started = time.perf_counter()
+    last_report = [started]
+
+    def on_checkpoint(records_done, sink_state):
+        save_checkpoint(args.output, {'settings': settings, 'records': records_done, 'sink': sink_state})
+        now = time.perf_counter()
+        if now - last_report[0] >= 10:
+            last_report[0] = now
+            rate = (records_done - done) / (now - started)
+            print(f'{records_done:,} records written ({rate:,.0f}/s)', file=sys.stderr)
+
+    if done:
+        print(f'resuming after {done:,} records', file=sys.stderr)
+    total = run(records, sink, args.tool, args.workers, args.chunk_size, done, on_checkpoint)
+    elapsed = time.perf_counter() - started
+    print(f'{total - done:,} records analyzed in {elapsed:.1f}s; {total:,} in {args.output}', file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
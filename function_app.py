@@ -1,30 +1,87 @@
+import time
+_import_started = time.perf_counter()
+
 import azure.functions as func
 import logging
-import openai
 import os
 import json
 import re
 import math
+import functools
+import codecs
+import gzip
+import contextlib
+import contextvars
+import concurrent.futures
+import threading
+import asyncio
+import hashlib
+import heapq
+import itertools
+import random
+import multiprocessing
+import urllib.parse
+from collections import OrderedDict, deque
+from concurrent.futures.process import BrokenProcessPool
+
+from prompts import build_system_prompt
+from syllables import count_word_syllables
 
 app = func.FunctionApp(http_auth_level=func.AuthLevel.FUNCTION)
 
+# Loading the FastAPI HTTP extension switches the worker to HTTP-streams mode
+# for every HTTP trigger in the app, so streaming is served by a separate
+# deployment of this code with HTTP_STREAMS_ENABLED=true. That deployment
+# registers only /api/utilities/stream; the func.HttpRequest routes below
+# live on a blueprint registered only when streams are off.
+HTTP_STREAMS_ENABLED = os.getenv('HTTP_STREAMS_ENABLED', 'false').lower() == 'true'
+buffered_routes = func.Blueprint()
+
+# openai and httpx are imported on first LLM use by load_llm_stack(), so
+# cold starts that only serve the analyzers never pay for them.
+openai = None
+httpx = None
+
+# Analyzer patterns are compiled once here instead of going through the re
+# module's cache lookup on every call.
+_WORD_BOUNDARY_RE = re.compile(r'\b\w+\b')
+_SENTENCE_END_RE = re.compile(r'[.!?]+(?=\s|$)')
+_WHITESPACE_RE = re.compile(r'\s')
+# Words for syllable counting keep their contractions ("don't", "you're")
+# together so the lexicon sees the word that is actually pronounced
+_SPOKEN_WORD_RE = re.compile(r"\w+(?:['’]\w+)*")
+
 def count_words(text):
-    return len(re.findall(r'\b\w+\b', text))
+    return len(_WORD_BOUNDARY_RE.findall(text))
 
 def count_sentences(text):
-    sentences = re.findall(r'([.!?]+)(?=\s|$)', text)
+    sentences = _SENTENCE_END_RE.findall(text)
     return len(sentences) if sentences else (1 if text.strip() else 0)
 
 def count_characters(text):
-    return len(re.sub(r'\s', '', text))
+    return len(_WHITESPACE_RE.sub('', text))
 
 def count_paragraphs(text):
     paragraphs = [p.strip() for p in text.strip().split('\n') if p.strip()]
     return len(paragraphs)
 
+@functools.lru_cache(maxsize=8192)
+def _chunk_syllables(chunk):
+    return sum(map(count_word_syllables, map(str.lower, _SPOKEN_WORD_RE.findall(chunk))))
+
 def count_syllables(text):
-    # Simple syllable estimation
-    return len(re.findall(r'[aeiouy]{1,2}', text.lower()))
+    # Whitespace-delimited chunks repeat far more often than whole texts, so
+    # they are memoized. The text is split a block at a time (each block
+    # ending on whitespace) to keep memory flat on large documents.
+    total = 0
+    start = 0
+    while start < len(text):
+        end = start + 65536
+        while end < len(text) and not text[end].isspace():
+            end += 1
+        total += sum(map(_chunk_syllables, text[start:end].split()))
+        start = end
+    return total
 
 def calc_reading_time(words):
     return round(words / 200, 2) if words > 0 else 0
@@ -32,17 +89,386 @@ def calc_reading_time(words):
 def calc_speaking_time(words):
     return round(words / 130, 2) if words > 0 else 0
 
-def calculate_flesch_reading_ease(text):
-    words = count_words(text)
-    sentences = count_sentences(text)
-    syllables = count_syllables(text)
+# Whitespace-delimited chunks (plus bare newlines, for paragraph tracking).
+# Words and sentence-ending punctuation never span whitespace, so
+# every count can be taken per chunk in a single scan of the text.
+_CHUNK_RE = re.compile(r'\n|\S+')
+_WORD_RE = re.compile(r'\w+')
+_MAX_MEMO_CHUNK = 64
+_LAST_WHITESPACE_RE = re.compile(r'\s(?=\S*\Z)')
+# Last character after which a chunk can be cut without splitting a word
+_LAST_WORD_BREAK_RE = re.compile(r"[^\w'’](?=[\w'’]*\Z)")
+# Longest partial chunk carried between pieces; text without whitespace
+# (CJK, URLs, base64) is flushed in parts beyond this
+_MAX_CARRY = 4096
+STREAM_CHUNK_SIZE = int(os.getenv('ANALYZER_STREAM_CHUNK_SIZE', 1 << 20))
+
+# Gunning Fog does not count these endings as a syllable of a complex word
+_FOG_SUFFIXES = ('es', 'ed', 'ing')
+
+def _scan_chunk(chunk):
+    # Returns (words, syllables, polysyllables, complex words, letters,
+    # ends a sentence). Syllables, and the polysyllabic and complex word
+    # counts that depend on them, are taken per spoken word.
+    if chunk.isalpha():
+        # A single plain word, the common chunk, needs none of the scans
+        word = chunk.lower()
+        syllables = count_word_syllables(word)
+        if syllables < 3:
+            return 1, syllables, 0, 0, len(chunk), False
+        return 1, syllables, 1, int(syllables > 3 or not word.endswith(_FOG_SUFFIXES)), len(chunk), False
+    
+    syllables = polysyllables = complex_words = 0
+    for word in _SPOKEN_WORD_RE.findall(chunk):
+        word = word.lower()
+        word_syllables = count_word_syllables(word)
+        syllables += word_syllables
+        if word_syllables >= 3:
+            polysyllables += 1
+            if word_syllables > 3 or not word.endswith(_FOG_SUFFIXES):
+                complex_words += 1
+    return (
+        len(_WORD_RE.findall(chunk)),
+        syllables,
+        polysyllables,
+        complex_words,
+        sum(map(str.isalpha, chunk)),
+        chunk[-1] in '.!?'
+    )
+
+_memo_chunk = functools.lru_cache(maxsize=8192)(_scan_chunk)
+
+def _split_point(piece):
+    # Index just past the last whitespace in piece, or None. The search
+    # looks at growing windows from the end, so a large piece is not
+    # scanned from the start.
+    size = 256
+    while True:
+        start = max(0, len(piece) - size)
+        match = _LAST_WHITESPACE_RE.search(piece, start)
+        if match is not None:
+            return match.end()
+        if start == 0:
+            return None
+        size *= 8
+
+class StreamingTextStats:
+    # Accumulates the collect_text_stats counts over text that arrives in
+    # pieces. Only the trailing partial chunk of each piece is carried over,
+    # so a word, vowel run or "?!" split across pieces is counted once.
+    def __init__(self):
+        self.words = 0
+        self.sentences = 0
+        self.characters = 0
+        self.paragraphs = 0
+        self.syllables = 0
+        self.polysyllables = 0
+        self.complex_words = 0
+        self.letters = 0
+        self.line_has_content = False
+        self.carry = ''
+    
+    def feed(self, piece):
+        # The carry holds no whitespace, so the split point is in the piece
+        split = _split_point(piece)
+        if split is None:
+            self.carry += piece
+        else:
+            buf = self.carry + piece if self.carry else piece
+            end = len(self.carry) + split
+            self.carry = piece[split:]
+            self._scan(buf, end)
+        if len(self.carry) > _MAX_CARRY:
+            self._flush_carry()
+    
+    def _flush_carry(self):
+        # Counts all but the tail of an overlong chunk. The cut goes after a
+        # character no word contains when there is one; otherwise a word is
+        # cut in two and counted once. The counted part cannot end a sentence,
+        # since the chunk goes on.
+        match = _LAST_WORD_BREAK_RE.search(self.carry)
+        if match is not None and 0 < len(self.carry) - match.end() <= _MAX_CARRY // 2:
+            cut = match.end()
+        else:
+            cut = len(self.carry) - 1
+        part, self.carry = self.carry[:cut], self.carry[cut:]
+        words, syllables, polysyllables, complex_words, letters, _ = _scan_chunk(part)
+        if _WORD_RE.match(part[-1]) and _WORD_RE.match(self.carry):
+            words -= 1
+        self.words += words
+        self.syllables += syllables
+        self.polysyllables += polysyllables
+        self.complex_words += complex_words
+        self.letters += letters
+        self.characters += len(part)
+        self.line_has_content = True
+    
+    def _scan(self, buf, end):
+        words = sentences = characters = paragraphs = syllables = 0
+        polysyllables = complex_words = letters = 0
+        line_has_content = self.line_has_content
+        
+        for match in _CHUNK_RE.finditer(buf, 0, end):
+            chunk = match.group()
+            if chunk == '\n':
+                if line_has_content:
+                    paragraphs += 1
+                    line_has_content = False
+                continue
+            
+            line_has_content = True
+            characters += len(chunk)
+            scan = _memo_chunk if len(chunk) <= _MAX_MEMO_CHUNK else _scan_chunk
+            chunk_words, chunk_syllables, chunk_polysyllables, chunk_complex, chunk_letters, ends_sentence = scan(chunk)
+            words += chunk_words
+            syllables += chunk_syllables
+            polysyllables += chunk_polysyllables
+            complex_words += chunk_complex
+            letters += chunk_letters
+            sentences += ends_sentence
+        
+        self.words += words
+        self.sentences += sentences
+        self.characters += characters
+        self.paragraphs += paragraphs
+        self.syllables += syllables
+        self.polysyllables += polysyllables
+        self.complex_words += complex_words
+        self.letters += letters
+        self.line_has_content = line_has_content
+    
+    def counts(self):
+        # Raw counts, which add up across texts joined with '\n'; result()
+        # applies the whole-text adjustment on top
+        if self.carry:
+            self._scan(self.carry, len(self.carry))
+            self.carry = ''
+        
+        return {
+            'words': self.words,
+            'sentences': self.sentences,
+            'characters': self.characters,
+            'paragraphs': self.paragraphs + (1 if self.line_has_content else 0),
+            'syllables': self.syllables,
+            'polysyllables': self.polysyllables,
+            'complex_words': self.complex_words,
+            'letters': self.letters
+        }
+    
+    def result(self):
+        return finish_counts(self.counts())
+
+def finish_counts(counts):
+    # Text without sentence-ending punctuation still counts as one sentence
+    if counts['sentences'] == 0 and counts['characters'] > 0:
+        return {**counts, 'sentences': 1}
+    return counts
+
+class DetailedTextStats(StreamingTextStats):
+    # StreamingTextStats that, in the same scan, also records the character
+    # span (code point offsets into the whole text, end exclusive), counts
+    # and scores of each paragraph and of the sentences in it. A sentence
+    # ends at sentence-ending punctuation or at the end of its paragraph.
+    # Only paragraphs first .. first + limit - 1 are kept, so paging through
+    # a long document does not hold every span in memory.
+    def __init__(self, first=0, limit=None):
+        super().__init__()
+        self.first = first
+        self.last = None if limit is None else first + limit
+        self.fed = 0
+        self.base = 0
+        self.paragraph_count = 0
+        self.details = []
+        self.paragraph = None
+        self.sentence = None
+    
+    def feed(self, piece):
+        # Offset of the carried-over chunk, which starts the next scan
+        self.base = self.fed - len(self.carry)
+        self.fed += len(piece)
+        super().feed(piece)
+    
+    def _scan(self, buf, end):
+        # The StreamingTextStats loop with span tracking added, so aggregates
+        # and details come from one pass over the chunks
+        words = sentences = characters = paragraphs = syllables = 0
+        polysyllables = complex_words = letters = 0
+        line_has_content = self.line_has_content
+        base = self.base
+        
+        for match in _CHUNK_RE.finditer(buf, 0, end):
+            chunk = match.group()
+            if chunk == '\n':
+                if line_has_content:
+                    paragraphs += 1
+                    line_has_content = False
+                    self._close_paragraph()
+                continue
+            
+            line_has_content = True
+            characters += len(chunk)
+            scan = _memo_chunk if len(chunk) <= _MAX_MEMO_CHUNK else _scan_chunk
+            chunk_words, chunk_syllables, chunk_polysyllables, chunk_complex, chunk_letters, ends_sentence = scan(chunk)
+            words += chunk_words
+            syllables += chunk_syllables
+            polysyllables += chunk_polysyllables
+            complex_words += chunk_complex
+            letters += chunk_letters
+            sentences += ends_sentence
+            
+            chunk_start, chunk_end = base + match.start(), base + match.end()
+            if self.paragraph is None:
+                self.paragraph = [chunk_start, chunk_end, 0, 0, 0, []]
+            paragraph = self.paragraph
+            paragraph[1] = chunk_end
+            paragraph[2] += chunk_words
+            paragraph[4] += chunk_syllables
+            if self.sentence is None:
+                self.sentence = [chunk_start, chunk_end, 0, 0]
+            sentence = self.sentence
+            sentence[1] = chunk_end
+            sentence[2] += chunk_words
+            sentence[3] += chunk_syllables
+            if ends_sentence:
+                paragraph[3] += 1
+                self._close_sentence()
+        
+        self.words += words
+        self.sentences += sentences
+        self.characters += characters
+        self.paragraphs += paragraphs
+        self.syllables += syllables
+        self.polysyllables += polysyllables
+        self.complex_words += complex_words
+        self.letters += letters
+        self.line_has_content = line_has_content
     
+    def _keep(self):
+        return self.paragraph_count >= self.first and (self.last is None or self.paragraph_count < self.last)
+    
+    def _close_sentence(self):
+        start, end, words, syllables = self.sentence
+        self.sentence = None
+        if self._keep():
+            self.paragraph[5].append({
+                'start': start,
+                'end': end,
+                'words': words,
+                'syllables': syllables,
+                'flesch_score': flesch_reading_ease(words, 1, syllables),
+                'flesch_kincaid_grade': flesch_kincaid_grade(words, 1, syllables)
+            })
+    
+    def _close_paragraph(self):
+        if self.sentence is not None:
+            self._close_sentence()
+        start, end, words, sentences, syllables, sentence_details = self.paragraph
+        self.paragraph = None
+        if self._keep():
+            # Same sentence rule as analyzing the paragraph on its own
+            sentences = max(1, sentences)
+            self.details.append({
+                'index': self.paragraph_count,
+                'start': start,
+                'end': end,
+                'words': words,
+                'sentences': sentences,
+                'syllables': syllables,
+                'flesch_score': flesch_reading_ease(words, sentences, syllables),
+                'flesch_kincaid_grade': flesch_kincaid_grade(words, sentences, syllables),
+                'sentence_details': sentence_details
+            })
+        self.paragraph_count += 1
+    
+    def counts(self):
+        self.base = self.fed - len(self.carry)
+        counts = super().counts()
+        if self.paragraph is not None:
+            self._close_paragraph()
+        return counts
+
+def collect_text_stats(text):
+    stats = StreamingTextStats()
+    stats.feed(text)
+    return stats.result()
+
+def collect_stream_stats(pieces):
+    stats = StreamingTextStats()
+    for piece in pieces:
+        stats.feed(piece)
+    return stats.result()
+
+def iter_body_text(body, chunk_size=STREAM_CHUNK_SIZE, encoding='utf-8'):
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    view = memoryview(body)
+    for start in range(0, len(view), chunk_size):
+        piece = decoder.decode(view[start:start + chunk_size])
+        if piece:
+            yield piece
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+def iter_file_text(path, chunk_size=STREAM_CHUNK_SIZE, encoding='utf-8'):
+    # newline='' keeps '\r' as-is so paragraph counts match the in-memory path
+    with open(path, 'r', encoding=encoding, errors='replace', newline='') as f:
+        while True:
+            piece = f.read(chunk_size)
+            if not piece:
+                break
+            yield piece
+
+def flesch_reading_ease(words, sentences, syllables):
     if words == 0 or sentences == 0:
         return 0
     
     score = 206.835 - (1.015 * (words / sentences)) - (84.6 * (syllables / words))
     return round(max(0, min(100, score)), 1)
 
+def grade_level(score):
+    return round(max(0, score), 1)
+
+def flesch_kincaid_grade(words, sentences, syllables):
+    if words == 0 or sentences == 0:
+        return 0
+    return grade_level(0.39 * (words / sentences) + 11.8 * (syllables / words) - 15.59)
+
+def gunning_fog(words, sentences, complex_words):
+    if words == 0 or sentences == 0:
+        return 0
+    return grade_level(0.4 * ((words / sentences) + 100 * (complex_words / words)))
+
+def smog_index(sentences, polysyllables):
+    if sentences == 0:
+        return 0
+    return grade_level(1.043 * math.sqrt(polysyllables * (30 / sentences)) + 3.1291)
+
+def coleman_liau_index(words, sentences, letters):
+    if words == 0:
+        return 0
+    return grade_level(0.0588 * (letters / words * 100) - 0.296 * (sentences / words * 100) - 15.8)
+
+def automated_readability_index(words, sentences, letters):
+    if words == 0 or sentences == 0:
+        return 0
+    return grade_level(4.71 * (letters / words) + 0.5 * (words / sentences) - 21.43)
+
+def readability_indices(stats):
+    # Every index is derived from the counts of the single scan, so adding
+    # one costs a few arithmetic operations rather than another pass
+    words, sentences = stats['words'], stats['sentences']
+    return {
+        'flesch_kincaid_grade': flesch_kincaid_grade(words, sentences, stats['syllables']),
+        'gunning_fog': gunning_fog(words, sentences, stats['complex_words']),
+        'smog_index': smog_index(sentences, stats['polysyllables']),
+        'coleman_liau_index': coleman_liau_index(words, sentences, stats['letters']),
+        'automated_readability_index': automated_readability_index(words, sentences, stats['letters'])
+    }
+
+def calculate_flesch_reading_ease(text):
+    stats = collect_text_stats(text)
+    return flesch_reading_ease(stats['words'], stats['sentences'], stats['syllables'])
+
 def get_readability_level(score):
     if score >= 90:
         return "Very Easy"
@@ -59,28 +485,20 @@ def get_readability_level(score):
     else:
         return "Very Difficult"
 
-def analyze_content(text):
-    words = count_words(text)
-    sentences = count_sentences(text)
-    characters = count_characters(text)
-    paragraphs = count_paragraphs(text)
-    syllables = count_syllables(text)
-    reading_time = calc_reading_time(words)
-    speaking_time = calc_speaking_time(words)
-    
+# Raw counts that only feed the readability indices and are not part of
+# either analyzer's output
+_INDEX_INPUTS = ('polysyllables', 'complex_words', 'letters')
+
+def summarize_stats(counts):
     return {
-        'words': words,
-        'sentences': sentences,
-        'characters': characters,
-        'paragraphs': paragraphs,
-        'syllables': syllables,
-        'reading_time': reading_time,
-        'speaking_time': speaking_time
+        **{name: value for name, value in counts.items() if name not in _INDEX_INPUTS},
+        'reading_time': calc_reading_time(counts['words']),
+        'speaking_time': calc_speaking_time(counts['words'])
     }
 
-def analyze_readability(text):
-    stats = analyze_content(text)
-    flesch_score = calculate_flesch_reading_ease(text)
+def readability_from_stats(counts):
+    stats = summarize_stats(counts)
+    flesch_score = flesch_reading_ease(stats['words'], stats['sentences'], stats['syllables'])
     readability_level = get_readability_level(flesch_score)
     
     # Calculate additional metrics
@@ -92,245 +510,944 @@ def analyze_readability(text):
         'flesch_score': flesch_score,
         'readability_level': readability_level,
         'avg_words_per_sentence': avg_words_per_sentence,
-        'avg_syllables_per_word': avg_syllables_per_word
+        'avg_syllables_per_word': avg_syllables_per_word,
+        **readability_indices(counts)
     }
 
-def generate_html_response(data, tool_type):
-    if tool_type == 'count-analyzer':
-        return f"""
-        <div class="analysis-results">
-            <div class="header-section">
-                <div class="icon-wrapper">
-                    <svg class="analysis-icon" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
-                        <path d="M14 2H6a2 2 0 0 0-2 2v16a2 2 0 0 0 2 2h12a2 2 0 0 0 2-2V8z"></path>
-                        <polyline points="14,2 14,8 20,8"></polyline>
-                        <line x1="16" y1="13" x2="8" y2="13"></line>
-                        <line x1="16" y1="17" x2="8" y2="17"></line>
-                    </svg>
+def analyze_content(text):
+    return summarize_stats(collect_text_stats(text))
+
+def analyze_readability(text):
+    return readability_from_stats(collect_text_stats(text))
+
+def analyze_content_stream(pieces):
+    return summarize_stats(collect_stream_stats(pieces))
+
+def analyze_readability_stream(pieces):
+    return readability_from_stats(collect_stream_stats(pieces))
+
+DETAIL_PAGE_SIZE = int(os.getenv('DETAIL_PAGE_SIZE', 200))
+DETAIL_MAX_PAGE_SIZE = int(os.getenv('DETAIL_MAX_PAGE_SIZE', 1000))
+
+def analyze_readability_detail(pieces, offset=0, limit=DETAIL_PAGE_SIZE):
+    # Document scores plus one page of per-paragraph and per-sentence scores;
+    # clients ask for next_offset until it is None
+    stats = DetailedTextStats(offset, limit)
+    for piece in pieces:
+        stats.feed(piece)
+    summary = readability_from_stats(stats.result())
+    return {
+        'summary': summary,
+        'paragraph_count': stats.paragraph_count,
+        'offset': offset,
+        'limit': limit,
+        'next_offset': offset + limit if offset + limit < stats.paragraph_count else None,
+        'paragraphs': stats.details
+    }
+
+def parse_detail_page(offset, limit):
+    # Returns (offset, limit), or None when either is not a valid number
+    try:
+        offset = 0 if offset in (None, '') else int(offset)
+        limit = DETAIL_PAGE_SIZE if limit in (None, '') else int(limit)
+    except (TypeError, ValueError):
+        return None
+    if offset < 0 or not 0 < limit <= DETAIL_MAX_PAGE_SIZE:
+        return None
+    return offset, limit
+
+def invalid_page_response():
+    return func.HttpResponse(
+        json.dumps({'error': f'offset must be 0 or more and limit between 1 and {DETAIL_MAX_PAGE_SIZE}.'}),
+        status_code=400,
+        mimetype='application/json'
+    )
+
+ANALYZERS = {
+    'count-analyzer': analyze_content,
+    'readability-score': analyze_readability
+}
+
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 1000))
+BATCH_INLINE_CHARS = int(os.getenv('BATCH_INLINE_CHARS', 256 * 1024))
+
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+def get_batch_pool():
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            # Workers are spawned, not forked: the Functions worker is
+            # multithreaded, and a fork would copy locks held by other threads
+            _batch_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _batch_pool
+
+def discard_batch_pool(pool):
+    # A pool whose worker died stays broken; the next batch starts a new one
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is pool:
+            _batch_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def run_batch_item(item):
+    tool_id, text = item
+    try:
+        return {'data': ANALYZERS[tool_id](text)}
+    except Exception as e:
+        return {'error': str(e)}
+
+def analyze_batch(items):
+    results = [None] * len(items)
+    jobs = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = {'id': None, 'error': 'Item must be an object.'}
+            continue
+        item_id = item.get('id')
+        text = item.get('text', '')
+        tool_id = item.get('tool_id', '')
+        if tool_id not in ANALYZERS:
+            results[index] = {'id': item_id, 'tool_id': tool_id, 'error': f'Unsupported tool_id for batch: {tool_id!r}'}
+        elif not isinstance(text, str) or not text.strip():
+            results[index] = {'id': item_id, 'tool_id': tool_id, 'error': 'No text provided.'}
+        else:
+            jobs.append((index, item_id, tool_id, text))
+    
+    payload = [(tool_id, text) for _, _, tool_id, text in jobs]
+    # Small batches are cheaper to run here than to ship to worker processes
+    if sum(len(text) for _, text in payload) <= BATCH_INLINE_CHARS:
+        outcomes = map(run_batch_item, payload)
+    else:
+        workers = os.cpu_count() or 1
+        chunksize = max(1, len(payload) // (workers * 4))
+        for attempt in range(2):
+            pool = get_batch_pool()
+            try:
+                outcomes = list(pool.map(run_batch_item, payload, chunksize=chunksize))
+                break
+            except BrokenProcessPool:
+                # The worker may have died on another request's items, so
+                # the batch is retried once on a fresh pool
+                discard_batch_pool(pool)
+                if attempt:
+                    raise
+    
+    for (index, item_id, tool_id, _), outcome in zip(jobs, outcomes):
+        results[index] = {'id': item_id, 'tool_id': tool_id, **outcome}
+    return results
+
+SESSION_MAX_DOCUMENTS = int(os.getenv('SESSION_MAX_DOCUMENTS', 1000))
+SESSION_TTL = float(os.getenv('SESSION_TTL', 1800))
+PARAGRAPH_CACHE_SIZE = int(os.getenv('PARAGRAPH_CACHE_SIZE', 50000))
+
+# Order of the per-paragraph count tuples kept by editing sessions
+COUNT_FIELDS = ('words', 'sentences', 'characters', 'paragraphs', 'syllables', 'polysyllables', 'complex_words', 'letters')
+
+class SessionConflict(Exception):
+    def __init__(self, message, version=None):
+        super().__init__(message)
+        self.version = version
+
+def paragraph_counts(paragraph):
+    stats = StreamingTextStats()
+    stats.feed(paragraph)
+    counts = stats.counts()
+    return tuple(counts[field] for field in COUNT_FIELDS)
+
+class ParagraphStatsCache:
+    # LRU of raw paragraph counts keyed by a hash of the paragraph, shared by
+    # all sessions: an undo, a paragraph pasted twice or two people editing
+    # the same template reuse the counts without keeping the text around.
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, paragraph):
+        # Returns (counts, computed)
+        key = hashlib.blake2b(paragraph.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        with self.lock:
+            counts = self.entries.get(key)
+            if counts is not None:
+                self.entries.move_to_end(key)
+                return counts, False
+        counts = paragraph_counts(paragraph)
+        with self.lock:
+            self.entries[key] = counts
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return counts, True
+
+class DocumentSession:
+    # Counts of each paragraph (line) of a document plus their running totals
+    __slots__ = ('paragraphs', 'totals', 'version', 'touched')
+    
+    def __init__(self, paragraphs):
+        self.paragraphs = paragraphs
+        self.totals = [sum(column) for column in zip(*paragraphs)] if paragraphs else [0] * len(COUNT_FIELDS)
+        self.version = 1
+        self.touched = time.monotonic()
+    
+    def splice(self, start, delete, inserted):
+        for counts in self.paragraphs[start:start + delete]:
+            for i, value in enumerate(counts):
+                self.totals[i] -= value
+        for counts in inserted:
+            for i, value in enumerate(counts):
+                self.totals[i] += value
+        self.paragraphs[start:start + delete] = inserted
+    
+    def counts(self):
+        return finish_counts(dict(zip(COUNT_FIELDS, self.totals)))
+
+def parse_changes(changes):
+    # Each change replaces `delete` paragraphs at `start` with `insert`;
+    # changes apply in order, each to the result of the previous one
+    if not isinstance(changes, list) or not changes:
+        raise ValueError('changes must be a non-empty list.')
+    parsed = []
+    for change in changes:
+        if not isinstance(change, dict):
+            raise ValueError('Each change must be an object.')
+        start = change.get('start')
+        delete = change.get('delete', 0)
+        inserted = change.get('insert', [])
+        if (
+            not isinstance(start, int) or not isinstance(delete, int)
+            or isinstance(start, bool) or isinstance(delete, bool)
+            or start < 0 or delete < 0
+        ):
+            raise ValueError('start and delete must be non-negative integers.')
+        if not isinstance(inserted, list) or not all(isinstance(p, str) and '\n' not in p for p in inserted):
+            raise ValueError('insert must be a list of paragraphs without newlines.')
+        parsed.append((start, delete, inserted))
+    return parsed
+
+class SessionStore:
+    # Editing sessions by document id, bounded by count (least recently used
+    # first) and idle time. Sessions live in the memory of one instance, so a
+    # client that gets a 409 resends the whole document to start over.
+    def __init__(self, max_documents, ttl, paragraph_cache):
+        self.max_documents = max_documents
+        self.ttl = ttl
+        self.paragraph_cache = paragraph_cache
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def _analyze(self, paragraphs):
+        counts, computed = [], 0
+        for paragraph in paragraphs:
+            paragraph_stats, was_computed = self.paragraph_cache.get(paragraph)
+            counts.append(paragraph_stats)
+            computed += was_computed
+        return counts, computed
+    
+    def _expire(self, now):
+        while self.sessions:
+            document_id, session = next(iter(self.sessions.items()))
+            if now - session.touched < self.ttl and len(self.sessions) <= self.max_documents:
+                break
+            del self.sessions[document_id]
+    
+    def start(self, document_id, text):
+        # Both start and edit return (counts, version, paragraphs computed,
+        # paragraphs sent), with counts and version read under the lock
+        paragraphs = text.split('\n')
+        counts, computed = self._analyze(paragraphs)
+        session = DocumentSession(counts)
+        with self.lock:
+            self.sessions[document_id] = session
+            self.sessions.move_to_end(document_id)
+            self._expire(session.touched)
+            return session.counts(), session.version, computed, len(paragraphs)
+    
+    def edit(self, document_id, version, changes):
+        # Paragraphs are analyzed before taking the lock; the version check
+        # and the splices then apply atomically
+        analyzed = []
+        computed = total = 0
+        for start, delete, inserted in changes:
+            counts, changed = self._analyze(inserted)
+            analyzed.append((start, delete, counts))
+            computed += changed
+            total += len(inserted)
+        
+        now = time.monotonic()
+        with self.lock:
+            self._expire(now)
+            session = self.sessions.get(document_id)
+            if session is None:
+                raise SessionConflict('Unknown or expired session; send the full text to start a new one.')
+            if version != session.version:
+                raise SessionConflict('Session version mismatch; send the full text to resynchronize.', session.version)
+            length = len(session.paragraphs)
+            for start, delete, counts in analyzed:
+                if start + delete > length:
+                    raise ValueError(f'Change at paragraph {start} deleting {delete} is out of range.')
+                length += len(counts) - delete
+            for start, delete, counts in analyzed:
+                session.splice(start, delete, counts)
+            session.version += 1
+            session.touched = now
+            self.sessions.move_to_end(document_id)
+            return session.counts(), session.version, computed, total
+
+session_store = SessionStore(SESSION_MAX_DOCUMENTS, SESSION_TTL, ParagraphStatsCache(PARAGRAPH_CACHE_SIZE))
+
+def session_analysis(tool_id, counts):
+    return summarize_stats(counts) if tool_id == 'count-analyzer' else readability_from_stats(counts)
+
+ANALYZER_CSS = """
+.analysis-results {
+    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Roboto', sans-serif;
+    max-width: 100%;
+    margin: 0 auto;
+}
+
+.header-section {
+    display: flex;
+    align-items: center;
+    margin-bottom: 2rem;
+    padding: 1.5rem;
+    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+    border-radius: 16px;
+    color: white;
+}
+
+.icon-wrapper {
+    margin-right: 1rem;
+}
+
+.analysis-icon {
+    width: 48px;
+    height: 48px;
+    color: white;
+}
+
+.header-text h3 {
+    margin: 0 0 0.5rem 0;
+    font-size: 1.5rem;
+    font-weight: 700;
+}
+
+.header-text p {
+    margin: 0;
+    opacity: 0.9;
+    font-size: 0.95rem;
+}
+
+.stats-container {
+    display: flex;
+    flex-direction: column;
+    gap: 1.5rem;
+}
+
+.primary-stats {
+    display: grid;
+    grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
+    gap: 1rem;
+}
+
+.secondary-stats {
+    display: grid;
+    grid-template-columns: repeat(auto-fit, minmax(150px, 1fr));
+    gap: 1rem;
+}
+
+.time-stats {
+    display: grid;
+    grid-template-columns: repeat(auto-fit, minmax(180px, 1fr));
+    gap: 1rem;
+}
+
+.stat-card {
+    background: white;
+    border: 2px solid #f1f5f9;
+    border-radius: 12px;
+    padding: 1.5rem;
+    display: flex;
+    align-items: center;
+    transition: all 0.3s ease;
+    box-shadow: 0 2px 8px rgba(0,0,0,0.08);
+}
+
+.stat-card:hover {
+    transform: translateY(-2px);
+    box-shadow: 0 8px 24px rgba(0,0,0,0.12);
+    border-color: #e2e8f0;
+}
+
+.stat-card.featured {
+    background: linear-gradient(135deg, #f8fafc 0%, #f1f5f9 100%);
+    border-color: #3b82f6;
+}
+
+.time-card {
+    background: linear-gradient(135deg, #fefce8 0%, #fef3c7 100%);
+    border-color: #f59e0b;
+}
+
+.stat-icon {
+    font-size: 2rem;
+    margin-right: 1rem;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    width: 60px;
+    height: 60px;
+    background: rgba(59, 130, 246, 0.1);
+    border-radius: 12px;
+    flex-shrink: 0;
+}
+
+.time-card .stat-icon {
+    background: rgba(245, 158, 11, 0.1);
+}
+
+.stat-content {
+    flex: 1;
+}
+
+.stat-value {
+    font-size: 2rem;
+    font-weight: 800;
+    color: #1e293b;
+    margin-bottom: 0.25rem;
+    line-height: 1;
+}
+
+.stat-label {
+    font-size: 0.9rem;
+    color: #64748b;
+    font-weight: 600;
+    text-transform: uppercase;
+    letter-spacing: 0.5px;
+}
+
+.stat-note {
+    font-size: 0.75rem;
+    color: #94a3b8;
+    margin-top: 0.25rem;
+    font-style: italic;
+}
+
+@media (max-width: 768px) {
+    .primary-stats, .secondary-stats, .time-stats {
+        grid-template-columns: 1fr;
+    }
+    
+    .stat-card {
+        padding: 1rem;
+    }
+    
+    .stat-icon {
+        width: 50px;
+        height: 50px;
+        font-size: 1.5rem;
+    }
+    
+    .stat-value {
+        font-size: 1.5rem;
+    }
+}
+
+.readability-results {
+    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Roboto', sans-serif;
+    max-width: 100%;
+    margin: 0 auto;
+}
+
+.score-hero {
+    display: flex;
+    align-items: center;
+    padding: 2rem;
+    background: linear-gradient(135deg, #f8fafc 0%, #e2e8f0 100%);
+    border-radius: 20px;
+    margin-bottom: 2rem;
+    box-shadow: 0 4px 20px rgba(0,0,0,0.08);
+}
+
+.score-circle {
+    width: 120px;
+    height: 120px;
+    border: 6px solid;
+    border-radius: 50%;
+    display: flex;
+    flex-direction: column;
+    align-items: center;
+    justify-content: center;
+    margin-right: 2rem;
+    position: relative;
+    background: white;
+    box-shadow: 0 4px 16px rgba(0,0,0,0.1);
+}
+
+.score-number {
+    font-size: 2.5rem;
+    font-weight: 900;
+    line-height: 1;
+}
+
+.score-max {
+    font-size: 0.9rem;
+    color: #64748b;
+    font-weight: 600;
+}
+
+.score-info h3 {
+    margin: 0 0 0.5rem 0;
+    font-size: 1.75rem;
+    font-weight: 700;
+    color: #1e293b;
+}
+
+.score-level {
+    font-size: 1.25rem;
+    font-weight: 700;
+    margin-bottom: 0.5rem;
+}
+
+.score-description {
+    color: #64748b;
+    font-size: 0.95rem;
+}
+
+.readability-scale {
+    margin-bottom: 2rem;
+    padding: 1.5rem;
+    background: white;
+    border-radius: 16px;
+    border: 2px solid #f1f5f9;
+}
+
+.scale-title {
+    font-size: 1.1rem;
+    font-weight: 700;
+    color: #1e293b;
+    margin-bottom: 1rem;
+    text-align: center;
+}
+
+.scale-bar {
+    position: relative;
+    height: 12px;
+    background: linear-gradient(to right, #ef4444 0%, #f97316 25%, #eab308 50%, #84cc16 75%, #22c55e 100%);
+    border-radius: 6px;
+    margin-bottom: 1rem;
+}
+
+.scale-marker {
+    position: absolute;
+    top: -6px;
+    transform: translateX(-50%);
+}
+
+.marker-dot {
+    width: 24px;
+    height: 24px;
+    border-radius: 50%;
+    border: 3px solid white;
+    box-shadow: 0 2px 8px rgba(0,0,0,0.2);
+}
+
+.scale-labels {
+    display: flex;
+    justify-content: space-between;
+    margin-top: 0.5rem;
+}
+
+.scale-label {
+    font-size: 0.75rem;
+    text-align: center;
+    color: #64748b;
+    font-weight: 600;
+}
+
+.scale-label small {
+    display: block;
+    color: #94a3b8;
+    font-weight: 400;
+}
+
+.detailed-analysis {
+    margin-bottom: 2rem;
+}
+
+.detailed-analysis h4 {
+    font-size: 1.25rem;
+    font-weight: 700;
+    color: #1e293b;
+    margin-bottom: 1rem;
+}
+
+.metrics-grid {
+    display: grid;
+    grid-template-columns: repeat(auto-fit, minmax(160px, 1fr));
+    gap: 1rem;
+}
+
+.metric-card {
+    background: white;
+    border: 2px solid #f1f5f9;
+    border-radius: 12px;
+    padding: 1.25rem;
+    display: flex;
+    align-items: center;
+    transition: all 0.3s ease;
+    box-shadow: 0 2px 8px rgba(0,0,0,0.06);
+}
+
+.metric-card:hover {
+    transform: translateY(-2px);
+    box-shadow: 0 8px 24px rgba(0,0,0,0.12);
+}
+
+.metric-card.primary {
+    background: linear-gradient(135deg, #dbeafe 0%, #bfdbfe 100%);
+    border-color: #3b82f6;
+}
+
+.metric-card.time {
+    background: linear-gradient(135deg, #fef3c7 0%, #fde68a 100%);
+    border-color: #f59e0b;
+}
+
+.metric-icon {
+    font-size: 1.5rem;
+    margin-right: 1rem;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    width: 48px;
+    height: 48px;
+    background: rgba(59, 130, 246, 0.1);
+    border-radius: 10px;
+    flex-shrink: 0;
+}
+
+.metric-card.time .metric-icon {
+    background: rgba(245, 158, 11, 0.1);
+}
+
+.metric-content {
+    flex: 1;
+}
+
+.metric-value {
+    font-size: 1.5rem;
+    font-weight: 800;
+    color: #1e293b;
+    line-height: 1;
+    margin-bottom: 0.25rem;
+}
+
+.metric-label {
+    font-size: 0.8rem;
+    color: #64748b;
+    font-weight: 600;
+    text-transform: uppercase;
+    letter-spacing: 0.5px;
+}
+
+.recommendations-section {
+    padding: 1.5rem;
+    background: linear-gradient(135deg, #f0f9ff 0%, #e0f2fe 100%);
+    border-radius: 16px;
+    border: 2px solid #0ea5e9;
+}
+
+.recommendations-section h4 {
+    font-size: 1.25rem;
+    font-weight: 700;
+    color: #0c4a6e;
+    margin-bottom: 1rem;
+}
+
+.recommendations-list {
+    display: flex;
+    flex-direction: column;
+    gap: 0.75rem;
+}
+
+.recommendation-item {
+    padding: 1rem;
+    background: white;
+    border-radius: 10px;
+    border-left: 4px solid #0ea5e9;
+    color: #0c4a6e;
+    font-weight: 500;
+    box-shadow: 0 2px 4px rgba(0,0,0,0.05);
+}
+
+@media (max-width: 768px) {
+    .score-hero {
+        flex-direction: column;
+        text-align: center;
+        padding: 1.5rem;
+    }
+    
+    .score-circle {
+        margin-right: 0;
+        margin-bottom: 1.5rem;
+    }
+    
+    .metrics-grid {
+        grid-template-columns: 1fr;
+    }
+    
+    .scale-labels {
+        flex-direction: column;
+        gap: 0.5rem;
+    }
+}
+"""
+
+ANALYZER_CSS_VERSION = hashlib.sha256(ANALYZER_CSS.encode('utf-8')).hexdigest()[:16]
+ANALYZER_CSS_ETAG = f'"{ANALYZER_CSS_VERSION}"'
+ANALYZER_CSS_URL = os.getenv('ANALYZER_CSS_URL', '')
+# Matches extensions.http.routePrefix in host.json (the default, "api")
+ROUTE_PREFIX = 'api'
+
+def compact_html(html):
+    # Indentation in the templates is for readability only
+    return ''.join(line.strip() for line in html.splitlines())
+
+COUNT_ANALYZER_TEMPLATE = compact_html("""
+<div class="analysis-results">
+    <div class="header-section">
+        <div class="icon-wrapper">
+            <svg class="analysis-icon" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                <path d="M14 2H6a2 2 0 0 0-2 2v16a2 2 0 0 0 2 2h12a2 2 0 0 0 2-2V8z"></path>
+                <polyline points="14,2 14,8 20,8"></polyline>
+                <line x1="16" y1="13" x2="8" y2="13"></line>
+                <line x1="16" y1="17" x2="8" y2="17"></line>
+            </svg>
+        </div>
+        <div class="header-text">
+            <h3>Content Analysis Results</h3>
+            <p>Comprehensive statistics about your content</p>
+        </div>
+    </div>
+    
+    <div class="stats-container">
+        <div class="primary-stats">
+            <div class="stat-card featured">
+                <div class="stat-icon">📝</div>
+                <div class="stat-content">
+                    <div class="stat-value">{words:,}</div>
+                    <div class="stat-label">Words</div>
                 </div>
-                <div class="header-text">
-                    <h3>Content Analysis Results</h3>
-                    <p>Comprehensive statistics about your content</p>
+            </div>
+            <div class="stat-card featured">
+                <div class="stat-icon">🔤</div>
+                <div class="stat-content">
+                    <div class="stat-value">{characters:,}</div>
+                    <div class="stat-label">Characters</div>
                 </div>
             </div>
-            
-            <div class="stats-container">
-                <div class="primary-stats">
-                    <div class="stat-card featured">
-                        <div class="stat-icon">📝</div>
-                        <div class="stat-content">
-                            <div class="stat-value">{data['words']:,}</div>
-                            <div class="stat-label">Words</div>
-                        </div>
-                    </div>
-                    <div class="stat-card featured">
-                        <div class="stat-icon">🔤</div>
-                        <div class="stat-content">
-                            <div class="stat-value">{data['characters']:,}</div>
-                            <div class="stat-label">Characters</div>
-                        </div>
-                    </div>
+        </div>
+        
+        <div class="secondary-stats">
+            <div class="stat-card">
+                <div class="stat-icon">📄</div>
+                <div class="stat-content">
+                    <div class="stat-value">{sentences}</div>
+                    <div class="stat-label">Sentences</div>
                 </div>
-                
-                <div class="secondary-stats">
-                    <div class="stat-card">
-                        <div class="stat-icon">📄</div>
-                        <div class="stat-content">
-                            <div class="stat-value">{data['sentences']}</div>
-                            <div class="stat-label">Sentences</div>
-                        </div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-icon">📋</div>
-                        <div class="stat-content">
-                            <div class="stat-value">{data['paragraphs']}</div>
-                            <div class="stat-label">Paragraphs</div>
-                        </div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-icon">🔊</div>
-                        <div class="stat-content">
-                            <div class="stat-value">{data['syllables']:,}</div>
-                            <div class="stat-label">Syllables</div>
-                        </div>
-                    </div>
+            </div>
+            <div class="stat-card">
+                <div class="stat-icon">📋</div>
+                <div class="stat-content">
+                    <div class="stat-value">{paragraphs}</div>
+                    <div class="stat-label">Paragraphs</div>
                 </div>
-                
-                <div class="time-stats">
-                    <div class="stat-card time-card">
-                        <div class="stat-icon">👁️</div>
-                        <div class="stat-content">
-                            <div class="stat-value">{data['reading_time']} min</div>
-                            <div class="stat-label">Reading Time</div>
-                            <div class="stat-note">~200 words/min</div>
-                        </div>
-                    </div>
-                    <div class="stat-card time-card">
-                        <div class="stat-icon">🎤</div>
-                        <div class="stat-content">
-                            <div class="stat-value">{data['speaking_time']} min</div>
-                            <div class="stat-label">Speaking Time</div>
-                            <div class="stat-note">~130 words/min</div>
-                        </div>
-                    </div>
+            </div>
+            <div class="stat-card">
+                <div class="stat-icon">🔊</div>
+                <div class="stat-content">
+                    <div class="stat-value">{syllables:,}</div>
+                    <div class="stat-label">Syllables</div>
                 </div>
             </div>
         </div>
-        <style>
-        .analysis-results {{
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Roboto', sans-serif;
-            max-width: 100%;
-            margin: 0 auto;
-        }}
-        
-        .header-section {{
-            display: flex;
-            align-items: center;
-            margin-bottom: 2rem;
-            padding: 1.5rem;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            border-radius: 16px;
-            color: white;
-        }}
-        
-        .icon-wrapper {{
-            margin-right: 1rem;
-        }}
-        
-        .analysis-icon {{
-            width: 48px;
-            height: 48px;
-            color: white;
-        }}
-        
-        .header-text h3 {{
-            margin: 0 0 0.5rem 0;
-            font-size: 1.5rem;
-            font-weight: 700;
-        }}
-        
-        .header-text p {{
-            margin: 0;
-            opacity: 0.9;
-            font-size: 0.95rem;
-        }}
-        
-        .stats-container {{
-            display: flex;
-            flex-direction: column;
-            gap: 1.5rem;
-        }}
-        
-        .primary-stats {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-            gap: 1rem;
-        }}
-        
-        .secondary-stats {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(150px, 1fr));
-            gap: 1rem;
-        }}
-        
-        .time-stats {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(180px, 1fr));
-            gap: 1rem;
-        }}
-        
-        .stat-card {{
-            background: white;
-            border: 2px solid #f1f5f9;
-            border-radius: 12px;
-            padding: 1.5rem;
-            display: flex;
-            align-items: center;
-            transition: all 0.3s ease;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.08);
-        }}
-        
-        .stat-card:hover {{
-            transform: translateY(-2px);
-            box-shadow: 0 8px 24px rgba(0,0,0,0.12);
-            border-color: #e2e8f0;
-        }}
-        
-        .stat-card.featured {{
-            background: linear-gradient(135deg, #f8fafc 0%, #f1f5f9 100%);
-            border-color: #3b82f6;
-        }}
-        
-        .time-card {{
-            background: linear-gradient(135deg, #fefce8 0%, #fef3c7 100%);
-            border-color: #f59e0b;
-        }}
-        
-        .stat-icon {{
-            font-size: 2rem;
-            margin-right: 1rem;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            width: 60px;
-            height: 60px;
-            background: rgba(59, 130, 246, 0.1);
-            border-radius: 12px;
-            flex-shrink: 0;
-        }}
-        
-        .time-card .stat-icon {{
-            background: rgba(245, 158, 11, 0.1);
-        }}
-        
-        .stat-content {{
-            flex: 1;
-        }}
-        
-        .stat-value {{
-            font-size: 2rem;
-            font-weight: 800;
-            color: #1e293b;
-            margin-bottom: 0.25rem;
-            line-height: 1;
-        }}
-        
-        .stat-label {{
-            font-size: 0.9rem;
-            color: #64748b;
-            font-weight: 600;
-            text-transform: uppercase;
-            letter-spacing: 0.5px;
-        }}
-        
-        .stat-note {{
-            font-size: 0.75rem;
-            color: #94a3b8;
-            margin-top: 0.25rem;
-            font-style: italic;
-        }}
-        
-        @media (max-width: 768px) {{
-            .primary-stats, .secondary-stats, .time-stats {{
-                grid-template-columns: 1fr;
-            }}
-            
-            .stat-card {{
-                padding: 1rem;
-            }}
-            
-            .stat-icon {{
-                width: 50px;
-                height: 50px;
-                font-size: 1.5rem;
-            }}
-            
-            .stat-value {{
-                font-size: 1.5rem;
-            }}
-        }}
-        </style>
-        """
+        
+        <div class="time-stats">
+            <div class="stat-card time-card">
+                <div class="stat-icon">👁️</div>
+                <div class="stat-content">
+                    <div class="stat-value">{reading_time} min</div>
+                    <div class="stat-label">Reading Time</div>
+                    <div class="stat-note">~200 words/min</div>
+                </div>
+            </div>
+            <div class="stat-card time-card">
+                <div class="stat-icon">🎤</div>
+                <div class="stat-content">
+                    <div class="stat-value">{speaking_time} min</div>
+                    <div class="stat-label">Speaking Time</div>
+                    <div class="stat-note">~130 words/min</div>
+                </div>
+            </div>
+        </div>
+    </div>
+</div>
+""")
+
+READABILITY_TEMPLATE = compact_html("""
+<div class="readability-results">
+    <div class="score-hero">
+        <div class="score-circle" style="border-color: {score_color};">
+            <div class="score-number" style="color: {score_color};">{flesch_score}</div>
+            <div class="score-max">/100</div>
+        </div>
+        <div class="score-info">
+            <h3>Flesch Reading Ease Score</h3>
+            <div class="score-level" style="color: {score_color};">{readability_level}</div>
+            <div class="score-description">
+                Higher scores indicate easier readability
+            </div>
+        </div>
+    </div>
+    
+    <div class="readability-scale">
+        <div class="scale-title">Readability Scale</div>
+        <div class="scale-bar">
+            <div class="scale-marker" style="left: {marker_position}%;">
+                <div class="marker-dot" style="background-color: {score_color};"></div>
+            </div>
+            <div class="scale-labels">
+                <span class="scale-label">Very Difficult<br><small>0-30</small></span>
+                <span class="scale-label">Difficult<br><small>30-50</small></span>
+                <span class="scale-label">Standard<br><small>50-70</small></span>
+                <span class="scale-label">Easy<br><small>70-90</small></span>
+                <span class="scale-label">Very Easy<br><small>90-100</small></span>
+            </div>
+        </div>
+    </div>
+    
+    <div class="detailed-analysis">
+        <h4>📊 Detailed Analysis</h4>
+        <div class="metrics-grid">
+            <div class="metric-card primary">
+                <div class="metric-icon">📝</div>
+                <div class="metric-content">
+                    <div class="metric-value">{words:,}</div>
+                    <div class="metric-label">Total Words</div>
+                </div>
+            </div>
+            <div class="metric-card primary">
+                <div class="metric-icon">📄</div>
+                <div class="metric-content">
+                    <div class="metric-value">{sentences}</div>
+                    <div class="metric-label">Sentences</div>
+                </div>
+            </div>
+            <div class="metric-card">
+                <div class="metric-icon">📏</div>
+                <div class="metric-content">
+                    <div class="metric-value">{avg_words_per_sentence}</div>
+                    <div class="metric-label">Avg Words/Sentence</div>
+                </div>
+            </div>
+            <div class="metric-card">
+                <div class="metric-icon">🔤</div>
+                <div class="metric-content">
+                    <div class="metric-value">{avg_syllables_per_word}</div>
+                    <div class="metric-label">Avg Syllables/Word</div>
+                </div>
+            </div>
+            <div class="metric-card time">
+                <div class="metric-icon">👁️</div>
+                <div class="metric-content">
+                    <div class="metric-value">{reading_time} min</div>
+                    <div class="metric-label">Reading Time</div>
+                </div>
+            </div>
+            <div class="metric-card time">
+                <div class="metric-icon">🎤</div>
+                <div class="metric-content">
+                    <div class="metric-value">{speaking_time} min</div>
+                    <div class="metric-label">Speaking Time</div>
+                </div>
+            </div>
+        </div>
+    </div>
+    
+    <div class="detailed-analysis">
+        <h4>🎓 Grade-Level Indices</h4>
+        <div class="metrics-grid">
+            <div class="metric-card">
+                <div class="metric-icon">📘</div>
+                <div class="metric-content">
+                    <div class="metric-value">{flesch_kincaid_grade}</div>
+                    <div class="metric-label">Flesch-Kincaid Grade</div>
+                </div>
+            </div>
+            <div class="metric-card">
+                <div class="metric-icon">🌫️</div>
+                <div class="metric-content">
+                    <div class="metric-value">{gunning_fog}</div>
+                    <div class="metric-label">Gunning Fog</div>
+                </div>
+            </div>
+            <div class="metric-card">
+                <div class="metric-icon">📐</div>
+                <div class="metric-content">
+                    <div class="metric-value">{smog_index}</div>
+                    <div class="metric-label">SMOG Index</div>
+                </div>
+            </div>
+            <div class="metric-card">
+                <div class="metric-icon">🔡</div>
+                <div class="metric-content">
+                    <div class="metric-value">{coleman_liau_index}</div>
+                    <div class="metric-label">Coleman-Liau Index</div>
+                </div>
+            </div>
+            <div class="metric-card">
+                <div class="metric-icon">🤖</div>
+                <div class="metric-content">
+                    <div class="metric-value">{automated_readability_index}</div>
+                    <div class="metric-label">Automated Readability Index</div>
+                </div>
+            </div>
+        </div>
+    </div>
+    
+    <div class="recommendations-section">
+        <h4>💡 Recommendations</h4>
+        <div class="recommendations-list">
+            {recommendations}
+        </div>
+    </div>
+</div>
+""")
+
+RECOMMENDATION_TEMPLATE = '<div class="recommendation-item">{}</div>'
+
+def analyzer_css_url(req):
+    # The stylesheet route is addressed from the route prefix, so every route
+    # that renders HTML links the same URL; the query string (which may carry
+    # a function key) is dropped and replaced by the ETag so a changed
+    # stylesheet gets a new URL.
+    if ANALYZER_CSS_URL:
+        return ANALYZER_CSS_URL
+    url = urllib.parse.urlsplit(req.url)
+    return f"{url.scheme}://{url.netloc}/{ROUTE_PREFIX}/utilities/analyzer.css?v={ANALYZER_CSS_VERSION}"
+
+def stylesheet_tag(stylesheet_url):
+    if stylesheet_url:
+        return f'<link rel="stylesheet" href="{stylesheet_url}">'
+    return f'<style>{ANALYZER_CSS}</style>'
+
+def generate_html_response(data, tool_type, stylesheet_url=None):
+    if tool_type == 'count-analyzer':
+        return COUNT_ANALYZER_TEMPLATE.format_map(data) + stylesheet_tag(stylesheet_url)
     
     elif tool_type == 'readability-score':
         # Determine score color based on readability level
@@ -368,358 +1485,1304 @@ def generate_html_response(data, tool_type):
         if data['flesch_score'] < 50:
             recommendations.append("📚 This text may be challenging for general audiences.")
         
-        return f"""
-        <div class="readability-results">
-            <div class="score-hero">
-                <div class="score-circle" style="border-color: {score_color};">
-                    <div class="score-number" style="color: {score_color};">{data['flesch_score']}</div>
-                    <div class="score-max">/100</div>
-                </div>
-                <div class="score-info">
-                    <h3>Flesch Reading Ease Score</h3>
-                    <div class="score-level" style="color: {score_color};">{data['readability_level']}</div>
-                    <div class="score-description">
-                        Higher scores indicate easier readability
-                    </div>
-                </div>
-            </div>
-            
-            <div class="readability-scale">
-                <div class="scale-title">Readability Scale</div>
-                <div class="scale-bar">
-                    <div class="scale-marker" style="left: {min(100, max(0, data['flesch_score']))}%;">
-                        <div class="marker-dot" style="background-color: {score_color};"></div>
-                    </div>
-                    <div class="scale-labels">
-                        <span class="scale-label">Very Difficult<br><small>0-30</small></span>
-                        <span class="scale-label">Difficult<br><small>30-50</small></span>
-                        <span class="scale-label">Standard<br><small>50-70</small></span>
-                        <span class="scale-label">Easy<br><small>70-90</small></span>
-                        <span class="scale-label">Very Easy<br><small>90-100</small></span>
-                    </div>
-                </div>
-            </div>
-            
-            <div class="detailed-analysis">
-                <h4>📊 Detailed Analysis</h4>
-                <div class="metrics-grid">
-                    <div class="metric-card primary">
-                        <div class="metric-icon">📝</div>
-                        <div class="metric-content">
-                            <div class="metric-value">{data['words']:,}</div>
-                            <div class="metric-label">Total Words</div>
-                        </div>
-                    </div>
-                    <div class="metric-card primary">
-                        <div class="metric-icon">📄</div>
-                        <div class="metric-content">
-                            <div class="metric-value">{data['sentences']}</div>
-                            <div class="metric-label">Sentences</div>
-                        </div>
-                    </div>
-                    <div class="metric-card">
-                        <div class="metric-icon">📏</div>
-                        <div class="metric-content">
-                            <div class="metric-value">{data['avg_words_per_sentence']}</div>
-                            <div class="metric-label">Avg Words/Sentence</div>
-                        </div>
-                    </div>
-                    <div class="metric-card">
-                        <div class="metric-icon">🔤</div>
-                        <div class="metric-content">
-                            <div class="metric-value">{data['avg_syllables_per_word']}</div>
-                            <div class="metric-label">Avg Syllables/Word</div>
-                        </div>
-                    </div>
-                    <div class="metric-card time">
-                        <div class="metric-icon">👁️</div>
-                        <div class="metric-content">
-                            <div class="metric-value">{data['reading_time']} min</div>
-                            <div class="metric-label">Reading Time</div>
-                        </div>
-                    </div>
-                    <div class="metric-card time">
-                        <div class="metric-icon">🎤</div>
-                        <div class="metric-content">
-                            <div class="metric-value">{data['speaking_time']} min</div>
-                            <div class="metric-label">Speaking Time</div>
-                        </div>
-                    </div>
-                </div>
-            </div>
-            
-            <div class="recommendations-section">
-                <h4>💡 Recommendations</h4>
-                <div class="recommendations-list">
-                    {''.join(f'<div class="recommendation-item">{rec}</div>' for rec in recommendations)}
-                </div>
-            </div>
-        </div>
-        <style>
-        .readability-results {{
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Roboto', sans-serif;
-            max-width: 100%;
-            margin: 0 auto;
-        }}
-        
-        .score-hero {{
-            display: flex;
-            align-items: center;
-            padding: 2rem;
-            background: linear-gradient(135deg, #f8fafc 0%, #e2e8f0 100%);
-            border-radius: 20px;
-            margin-bottom: 2rem;
-            box-shadow: 0 4px 20px rgba(0,0,0,0.08);
-        }}
-        
-        .score-circle {{
-            width: 120px;
-            height: 120px;
-            border: 6px solid;
-            border-radius: 50%;
-            display: flex;
-            flex-direction: column;
-            align-items: center;
-            justify-content: center;
-            margin-right: 2rem;
-            position: relative;
-            background: white;
-            box-shadow: 0 4px 16px rgba(0,0,0,0.1);
-        }}
-        
-        .score-number {{
-            font-size: 2.5rem;
-            font-weight: 900;
-            line-height: 1;
-        }}
-        
-        .score-max {{
-            font-size: 0.9rem;
-            color: #64748b;
-            font-weight: 600;
-        }}
-        
-        .score-info h3 {{
-            margin: 0 0 0.5rem 0;
-            font-size: 1.75rem;
-            font-weight: 700;
-            color: #1e293b;
-        }}
-        
-        .score-level {{
-            font-size: 1.25rem;
-            font-weight: 700;
-            margin-bottom: 0.5rem;
-        }}
-        
-        .score-description {{
-            color: #64748b;
-            font-size: 0.95rem;
-        }}
-        
-        .readability-scale {{
-            margin-bottom: 2rem;
-            padding: 1.5rem;
-            background: white;
-            border-radius: 16px;
-            border: 2px solid #f1f5f9;
-        }}
-        
-        .scale-title {{
-            font-size: 1.1rem;
-            font-weight: 700;
-            color: #1e293b;
-            margin-bottom: 1rem;
-            text-align: center;
-        }}
-        
-        .scale-bar {{
-            position: relative;
-            height: 12px;
-            background: linear-gradient(to right, #ef4444 0%, #f97316 25%, #eab308 50%, #84cc16 75%, #22c55e 100%);
-            border-radius: 6px;
-            margin-bottom: 1rem;
-        }}
-        
-        .scale-marker {{
-            position: absolute;
-            top: -6px;
-            transform: translateX(-50%);
-        }}
-        
-        .marker-dot {{
-            width: 24px;
-            height: 24px;
-            border-radius: 50%;
-            border: 3px solid white;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.2);
-        }}
-        
-        .scale-labels {{
-            display: flex;
-            justify-content: space-between;
-            margin-top: 0.5rem;
-        }}
-        
-        .scale-label {{
-            font-size: 0.75rem;
-            text-align: center;
-            color: #64748b;
-            font-weight: 600;
-        }}
-        
-        .scale-label small {{
-            display: block;
-            color: #94a3b8;
-            font-weight: 400;
-        }}
-        
-        .detailed-analysis {{
-            margin-bottom: 2rem;
-        }}
-        
-        .detailed-analysis h4 {{
-            font-size: 1.25rem;
-            font-weight: 700;
-            color: #1e293b;
-            margin-bottom: 1rem;
-        }}
-        
-        .metrics-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(160px, 1fr));
-            gap: 1rem;
-        }}
-        
-        .metric-card {{
-            background: white;
-            border: 2px solid #f1f5f9;
-            border-radius: 12px;
-            padding: 1.25rem;
-            display: flex;
-            align-items: center;
-            transition: all 0.3s ease;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.06);
-        }}
-        
-        .metric-card:hover {{
-            transform: translateY(-2px);
-            box-shadow: 0 8px 24px rgba(0,0,0,0.12);
-        }}
-        
-        .metric-card.primary {{
-            background: linear-gradient(135deg, #dbeafe 0%, #bfdbfe 100%);
-            border-color: #3b82f6;
-        }}
-        
-        .metric-card.time {{
-            background: linear-gradient(135deg, #fef3c7 0%, #fde68a 100%);
-            border-color: #f59e0b;
-        }}
-        
-        .metric-icon {{
-            font-size: 1.5rem;
-            margin-right: 1rem;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            width: 48px;
-            height: 48px;
-            background: rgba(59, 130, 246, 0.1);
-            border-radius: 10px;
-            flex-shrink: 0;
-        }}
-        
-        .metric-card.time .metric-icon {{
-            background: rgba(245, 158, 11, 0.1);
-        }}
-        
-        .metric-content {{
-            flex: 1;
-        }}
-        
-        .metric-value {{
-            font-size: 1.5rem;
-            font-weight: 800;
-            color: #1e293b;
-            line-height: 1;
-            margin-bottom: 0.25rem;
-        }}
-        
-        .metric-label {{
-            font-size: 0.8rem;
-            color: #64748b;
-            font-weight: 600;
-            text-transform: uppercase;
-            letter-spacing: 0.5px;
-        }}
-        
-        .recommendations-section {{
-            padding: 1.5rem;
-            background: linear-gradient(135deg, #f0f9ff 0%, #e0f2fe 100%);
-            border-radius: 16px;
-            border: 2px solid #0ea5e9;
-        }}
-        
-        .recommendations-section h4 {{
-            font-size: 1.25rem;
-            font-weight: 700;
-            color: #0c4a6e;
-            margin-bottom: 1rem;
-        }}
-        
-        .recommendations-list {{
-            display: flex;
-            flex-direction: column;
-            gap: 0.75rem;
-        }}
-        
-        .recommendation-item {{
-            padding: 1rem;
-            background: white;
-            border-radius: 10px;
-            border-left: 4px solid #0ea5e9;
-            color: #0c4a6e;
-            font-weight: 500;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.05);
-        }}
-        
-        @media (max-width: 768px) {{
-            .score-hero {{
-                flex-direction: column;
-                text-align: center;
-                padding: 1.5rem;
-            }}
-            
-            .score-circle {{
-                margin-right: 0;
-                margin-bottom: 1.5rem;
-            }}
-            
-            .metrics-grid {{
-                grid-template-columns: 1fr;
-            }}
-            
-            .scale-labels {{
-                flex-direction: column;
-                gap: 0.5rem;
-            }}
-        }}
-        </style>
-        """
-
-@app.route(route="utilities")
-def utilities(req: func.HttpRequest) -> func.HttpResponse:
-    if req.method != 'POST':
+        return READABILITY_TEMPLATE.format_map({
+            **data,
+            'score_color': score_color,
+            'marker_position': min(100, max(0, data['flesch_score'])),
+            'recommendations': ''.join(RECOMMENDATION_TEMPLATE.format(rec) for rec in recommendations)
+        }) + stylesheet_tag(stylesheet_url)
+
+INSTRUMENTATION_ENABLED = os.getenv('INSTRUMENTATION_ENABLED', 'true').lower() == 'true'
+
+# The RequestTimer of the request being handled; set by the route wrapper and
+# read by stages deeper in the call graph, including worker threads started
+# with asyncio.to_thread, which copy the context.
+_current_timer = contextvars.ContextVar('utilities_timer', default=None)
+
+class RequestTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.fields = {}
+    
+    @contextlib.contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+    
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+    
+    def count(self, name, amount=1):
+        self.fields[name] = self.fields.get(name, 0) + amount
+    
+    def set(self, name, value):
+        self.fields[name] = value
+    
+    def server_timing(self, total):
+        entries = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.stages.items()]
+        entries.append(f'total;dur={total * 1000:.1f}')
+        if 'cache' in self.fields:
+            entries.append(f'cache;desc="{self.fields["cache"]}"')
+        return ', '.join(entries)
+    
+    def emit(self, status_code, total):
+        record = {
+            **self.fields,
+            'status_code': status_code,
+            'total_ms': round(total * 1000, 2),
+            **{f'{name}_ms': round(seconds * 1000, 2) for name, seconds in self.stages.items()}
+        }
+        # custom_dimensions is picked up as structured properties by the
+        # Application Insights log exporters
+        logging.info('utilities request %s', json.dumps(record), extra={'custom_dimensions': record})
+        
+        meter = get_metrics()
+        if meter:
+            attributes = {'tool_id': self.fields.get('tool_id', ''), 'status_code': status_code}
+            meter['duration'].record(total * 1000, {**attributes, 'stage': 'total'})
+            for name, seconds in self.stages.items():
+                meter['duration'].record(seconds * 1000, {**attributes, 'stage': name})
+            for name in ('prompt_tokens', 'completion_tokens'):
+                if name in self.fields:
+                    meter['tokens'].add(self.fields[name], {**attributes, 'kind': name})
+            if 'input_chars' in self.fields:
+                meter['input_size'].record(self.fields['input_chars'], attributes)
+
+_metrics = None
+
+def get_metrics():
+    # Custom metrics go through the OpenTelemetry API when it is installed.
+    # The API alone records into a no-op provider, so when the app has an
+    # Application Insights connection string the Azure Monitor exporter is
+    # configured here and the metrics land there as customMetrics. Logs and
+    # requests are already collected by the Functions host, so only metrics
+    # are exported.
+    global _metrics
+    if _metrics is None:
+        if os.getenv('APPLICATIONINSIGHTS_CONNECTION_STRING'):
+            try:
+                from azure.monitor.opentelemetry import configure_azure_monitor
+                configure_azure_monitor(disable_logging=True, disable_tracing=True)
+            except ImportError:
+                logging.warning('APPLICATIONINSIGHTS_CONNECTION_STRING is set but azure-monitor-opentelemetry is not installed; custom metrics are not exported.')
+        try:
+            from opentelemetry import metrics
+            meter = metrics.get_meter('utilities')
+            _metrics = {
+                'duration': meter.create_histogram('utilities.stage.duration', unit='ms'),
+                'tokens': meter.create_counter('utilities.tokens'),
+                'input_size': meter.create_histogram('utilities.input.size', unit='chars')
+            }
+        except ImportError:
+            _metrics = False
+    return _metrics
+
+def timed_stage(name):
+    timer = _current_timer.get()
+    return timer.stage(name) if timer is not None else contextlib.nullcontext()
+
+def record_field(name, value):
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.set(name, value)
+
+def record_count(name, amount=1):
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.count(name, amount)
+
+async def instrumented(handler, req):
+    if not INSTRUMENTATION_ENABLED:
+        return await handler(req)
+    timer = RequestTimer()
+    token = _current_timer.set(timer)
+    try:
+        response = await handler(req)
+    finally:
+        _current_timer.reset(token)
+    total = time.perf_counter() - timer.started
+    response.headers['Server-Timing'] = timer.server_timing(total)
+    # Lets the cross-origin website read the timings in the browser
+    response.headers['Timing-Allow-Origin'] = '*'
+    timer.emit(response.status_code, total)
+    return response
+
+OUTPUT_FORMATS = {
+    'text/html': 'html',
+    'application/json': 'json',
+    'application/msgpack': 'msgpack',
+    'application/x-msgpack': 'msgpack',
+    'application/vnd.msgpack': 'msgpack'
+}
+
+def negotiate_format(req, requested=None):
+    # An explicit format field wins; otherwise the highest-q supported media
+    # type in Accept. HTML stays the default for browsers sending */*.
+    if requested:
+        if not isinstance(requested, str):
+            return None
+        requested = requested.lower()
+        if requested not in ('html', 'json', 'msgpack'):
+            return None
+        if requested == 'msgpack' and not msgpack_available():
+            return None
+        return requested
+    
+    best_format, best_q = 'html', 0.0
+    for media_range in req.headers.get('Accept', '').split(','):
+        media_type, _, params = media_range.strip().partition(';')
+        output_format = OUTPUT_FORMATS.get(media_type.strip().lower())
+        if output_format is None or (output_format == 'msgpack' and not msgpack_available()):
+            continue
+        q = header_quality(params)
+        if q > best_q:
+            best_format, best_q = output_format, q
+    return best_format
+
+def header_quality(params):
+    # q value from the parameters of one Accept or Accept-Encoding item
+    for param in params.split(';'):
+        name, _, value = param.strip().partition('=')
+        if name == 'q':
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+_msgpack = None
+
+def msgpack_available():
+    global _msgpack
+    if _msgpack is None:
+        try:
+            import msgpack
+            _msgpack = msgpack
+        except ImportError:
+            _msgpack = False
+    return _msgpack is not False
+
+COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true'
+COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 6))
+BROTLI_LEVEL = int(os.getenv('BROTLI_LEVEL', 5))
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/x-ndjson')
+
+_brotli = None
+
+def brotli_available():
+    global _brotli
+    if _brotli is None:
+        try:
+            import brotli
+            _brotli = brotli
+        except ImportError:
+            _brotli = False
+    return _brotli is not False
+
+def negotiate_encoding(req):
+    # Highest-q of br (when the brotli package is installed) and gzip in
+    # Accept-Encoding, br winning ties; None means send the body as is
+    accepted = {}
+    for item in req.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = item.strip().partition(';')
+        if coding:
+            accepted[coding.strip().lower()] = header_quality(params)
+    
+    best_encoding, best_q = None, 0.0
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and not brotli_available():
+            continue
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > best_q:
+            best_encoding, best_q = encoding, q
+    return best_encoding
+
+def compress_body(body, encoding, level=None):
+    if encoding == 'br':
+        return _brotli.compress(body, quality=BROTLI_LEVEL if level is None else level)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL if level is None else level, mtime=0)
+
+def compress_response(req, response):
+    # Compresses text bodies of at least COMPRESSION_MIN_BYTES; smaller ones
+    # cost more to compress than they save on the wire
+    if not COMPRESSION_ENABLED or 'Content-Encoding' in response.headers:
+        return response
+    body = response.get_body()
+    if len(body) < COMPRESSION_MIN_BYTES or not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES):
+        return response
+    
+    vary = response.headers.get('Vary')
+    response.headers['Vary'] = f'{vary}, Accept-Encoding' if vary else 'Accept-Encoding'
+    encoding = negotiate_encoding(req)
+    if encoding is None:
+        return response
+    with timed_stage('compress'):
+        compressed = compress_body(body, encoding)
+    if len(compressed) >= len(body):
+        return response
+    
+    headers = dict(response.headers)
+    headers['Content-Encoding'] = encoding
+    record_field('compressed_bytes', len(compressed))
+    return func.HttpResponse(
+        compressed,
+        status_code=response.status_code,
+        headers=headers,
+        mimetype=response.mimetype,
+        charset=response.charset
+    )
+
+def compressed_responses(handler):
+    # For async route handlers; runs inside instrumented() so the time spent
+    # compressing shows up as its own stage
+    @functools.wraps(handler)
+    async def wrapper(req):
+        return compress_response(req, await handler(req))
+    return wrapper
+
+def unsupported_format_response():
+    return func.HttpResponse(
+        json.dumps({'error': 'Unsupported format; use html, json or msgpack (requires the msgpack package).'}),
+        status_code=406,
+        mimetype='application/json'
+    )
+
+def analysis_response(req, analysis_data, tool_id, output_format):
+    if output_format == 'json':
+        return func.HttpResponse(
+            json.dumps(analysis_data, separators=(',', ':')),
+            status_code=200,
+            mimetype='application/json'
+        )
+    if output_format == 'msgpack':
+        return func.HttpResponse(
+            _msgpack.packb(analysis_data),
+            status_code=200,
+            mimetype='application/msgpack'
+        )
+    with timed_stage('render'):
+        html_response = generate_html_response(analysis_data, tool_id, analyzer_css_url(req))
+    return func.HttpResponse(
+        html_response,
+        status_code=200,
+        mimetype='text/html'
+    )
+
+def detail_response(detail_data, output_format):
+    # The heatmap is data for the client to lay over its own copy of the
+    # text, so it has no HTML rendering; HTML requests get JSON
+    if output_format == 'msgpack':
+        return func.HttpResponse(
+            _msgpack.packb(detail_data),
+            status_code=200,
+            mimetype='application/msgpack'
+        )
+    return func.HttpResponse(
+        json.dumps(detail_data, separators=(',', ':')),
+        status_code=200,
+        mimetype='application/json'
+    )
+
+async def analyze_text_body(req: func.HttpRequest) -> func.HttpResponse:
+    tool_id = req.params.get('tool_id', '')
+    if tool_id not in ('count-analyzer', 'readability-score'):
+        return func.HttpResponse(
+            json.dumps({'error': 'Plain-text bodies are only supported for count-analyzer and readability-score.'}),
+            status_code=400,
+            mimetype='application/json'
+        )
+    
+    output_format = negotiate_format(req, req.params.get('format'))
+    if output_format is None:
+        return unsupported_format_response()
+    
+    try:
+        body = req.get_body()
+        record_field('tool_id', tool_id)
+        record_field('input_bytes', len(body))
+        pieces = iter_body_text(body)
+        if tool_id == 'readability-score' and req.params.get('detail', '').lower() in ('1', 'true'):
+            page = parse_detail_page(req.params.get('offset'), req.params.get('limit'))
+            if page is None:
+                return invalid_page_response()
+            with timed_stage('analyze'):
+                analysis_data = await asyncio.to_thread(analyze_readability_detail, pieces, *page)
+            if analysis_data['summary']['characters'] == 0:
+                return func.HttpResponse(
+                    json.dumps({'error': 'No text provided.'}),
+                    status_code=400,
+                    mimetype='application/json'
+                )
+            return detail_response(analysis_data, output_format)
+        
+        with timed_stage('analyze'):
+            if tool_id == 'count-analyzer':
+                analysis_data = await asyncio.to_thread(analyze_content_stream, pieces)
+            else:
+                analysis_data = await asyncio.to_thread(analyze_readability_stream, pieces)
+        
+        if analysis_data['characters'] == 0:
+            return func.HttpResponse(
+                json.dumps({'error': 'No text provided.'}),
+                status_code=400,
+                mimetype='application/json'
+            )
+        
+        return analysis_response(req, analysis_data, tool_id, output_format)
+    
+    except Exception as e:
+        return func.HttpResponse(
+            json.dumps({'error': str(e)}),
+            status_code=500,
+            mimetype='application/json'
+        )
+
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', 100))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('OPENAI_MAX_KEEPALIVE_CONNECTIONS', 20))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv('OPENAI_KEEPALIVE_EXPIRY', 60))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', 5))
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', 60))
+
+startup_timings = {}
+
+def load_llm_stack():
+    global openai, httpx
+    if openai is None:
+        started = time.perf_counter()
+        import httpx as httpx_module
+        import openai as openai_module
+        httpx = httpx_module
+        openai = openai_module
+        startup_timings['llm_stack_import_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        logging.info('Loaded openai/httpx in %.1f ms', startup_timings['llm_stack_import_ms'])
+    return openai
+
+def is_upstream_rate_limit(error):
+    return openai is not None and isinstance(error, openai.RateLimitError)
+
+def build_http_limits():
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY
+    )
+
+def build_http_timeout():
+    return httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+
+# (api_key, event loop, client): httpx.AsyncClient connections belong to the
+# loop that opened them, so the async client is rebuilt if the loop changes.
+_async_openai_client = (None, None, None)
+_closing_clients = set()
+
+def close_client_later(client, client_loop):
+    # Requests already in flight on a replaced client may run until their
+    # latency budget is spent, so its connection pool is closed after that
+    if client_loop.is_closed():
+        return
+    delay = max([DEFAULT_LATENCY_BUDGET, *TOOL_LATENCY_BUDGETS.values()])
+    
+    def close():
+        task = client_loop.create_task(client.close())
+        _closing_clients.add(task)
+        task.add_done_callback(_closing_clients.discard)
+    
+    client_loop.call_soon_threadsafe(client_loop.call_later, delay, close)
+
+def get_async_openai_client(api_key):
+    global _async_openai_client
+    loop = asyncio.get_running_loop()
+    key, client_loop, client = _async_openai_client
+    if client is None or key != api_key or client_loop is not loop:
+        if client is not None:
+            close_client_later(client, client_loop)
+        load_llm_stack()
+        # Retries are handled by resilient_completion within the tool's
+        # latency budget, so the SDK's own retry loop is turned off
+        client = openai.AsyncOpenAI(
+            api_key=api_key,
+            timeout=build_http_timeout(),
+            max_retries=0,
+            http_client=httpx.AsyncClient(limits=build_http_limits(), timeout=build_http_timeout())
+        )
+        _async_openai_client = (api_key, loop, client)
+    return client
+
+OPENAI_MODEL = "gpt-4o-mini"
+
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', 2048))
+LLM_CACHE_MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', 24 * 3600))
+LLM_CACHE_DIR = os.getenv('LLM_CACHE_DIR', '')
+LLM_CACHE_DISK_MAX_BYTES = int(os.getenv('LLM_CACHE_DISK_MAX_BYTES', 512 * 1024 * 1024))
+
+MODEL_CONTEXT_TOKENS = int(os.getenv('OPENAI_CONTEXT_TOKENS', 128000))
+MODEL_MAX_OUTPUT_TOKENS = int(os.getenv('OPENAI_MAX_OUTPUT_TOKENS', 16384))
+MIN_COMPLETION_TOKENS = int(os.getenv('OPENAI_MIN_COMPLETION_TOKENS', 256))
+MESSAGE_OVERHEAD_TOKENS = 11
+TOKEN_ESTIMATOR = os.getenv('TOKEN_ESTIMATOR', 'heuristic')
+
+# max_tokens per tool as (base, multiple of input tokens): rewrites scale with
+# the input, generators that emit a short list do not.
+TOOL_OUTPUT_BUDGETS = {
+    'proofreading': (400, 2.0),
+    'paraphrasing': (200, 1.3),
+    'ai-humanizer': (200, 1.3),
+    'ai-summarizer': (300, 0.3),
+    'outline-generation': (500, 0.2),
+    'split-sentence': (200, 1.3),
+    'table-generator': (400, 1.2),
+    'faq-generator': (600, 0.3),
+    'glossary-generator': (600, 0.3),
+    'language-translation': (200, 2.0),
+    'word-choice-optimization': (200, 1.3),
+    'change-tone': (200, 1.3),
+    'make-longer-shorter': (300, 2.0),
+    'change-voice': (200, 1.3),
+    'change-speech': (200, 1.3),
+    'seo-description-generator': (300, 0),
+    'tag-recommender': (150, 0),
+    'title-recommender': (250, 0)
+}
+DEFAULT_OUTPUT_BUDGET = (1000, 0)
+
+_tiktoken_encoding = None
+# Han, kana and Hangul (plus full-width forms) take about one token each
+_CJK_RE = re.compile('[\u1100-\u11ff\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef\U00020000-\U0003ffff]')
+
+def estimate_tokens(text):
+    # The default is an offline estimate (~0.75 words per token for prose,
+    # ~4 characters per token for dense text, one token per CJK character
+    # and one per two other non-ASCII characters); TOKEN_ESTIMATOR=tiktoken
+    # uses the real encoding when that package and its data files are
+    # installed.
+    global _tiktoken_encoding
+    if TOKEN_ESTIMATOR == 'tiktoken':
+        if _tiktoken_encoding is None:
+            try:
+                import tiktoken
+                _tiktoken_encoding = tiktoken.encoding_for_model(OPENAI_MODEL)
+            except Exception as e:
+                logging.warning('tiktoken unavailable, using heuristic estimate: %s', e)
+                _tiktoken_encoding = False
+        if _tiktoken_encoding:
+            return len(_tiktoken_encoding.encode(text, disallowed_special=()))
+    estimate = max(math.ceil(count_words(text) * 4 / 3), math.ceil(len(text) / 4))
+    if text.isascii():
+        return estimate
+    # Other scripts take far more tokens per character than English
+    non_ascii = len(text) - len(text.encode('ascii', 'ignore'))
+    cjk = _CJK_RE.subn('', text)[1]
+    scripts = cjk + math.ceil((non_ascii - cjk) / 2) + math.ceil((len(text) - non_ascii) / 4)
+    return max(estimate, scripts)
+
+def output_token_budget(tool_id, input_tokens):
+    base, ratio = TOOL_OUTPUT_BUDGETS.get(tool_id, DEFAULT_OUTPUT_BUDGET)
+    return min(MODEL_MAX_OUTPUT_TOKENS, base + math.ceil(ratio * input_tokens))
+
+def plan_completion(tool_id, prompt, text):
+    text_tokens = estimate_tokens(text)
+    prompt_tokens = estimate_tokens(prompt) + text_tokens + MESSAGE_OVERHEAD_TOKENS
+    budget = output_token_budget(tool_id, text_tokens)
+    room = MODEL_CONTEXT_TOKENS - prompt_tokens
+    # max_tokens of 0 means the input leaves no useful room for an answer
+    if room < min(budget, MIN_COMPLETION_TOKENS):
+        return prompt_tokens, 0
+    return prompt_tokens, min(budget, room)
+
+def completion_params(max_tokens):
+    return {'model': OPENAI_MODEL, 'max_tokens': max_tokens, 'temperature': 0}
+
+def input_too_large_message(prompt_tokens):
+    return (
+        f'Input is too large: about {prompt_tokens:,} tokens, but the model accepts '
+        f'{MODEL_CONTEXT_TOKENS - MIN_COMPLETION_TOKENS:,} including the prompt.'
+    )
+
+class InputTooLarge(Exception):
+    pass
+
+def resolve_prompt(tool_id, data):
+    # Registered tools always get the server-built prompt so cache keys stay
+    # byte-stable; a client-supplied prompt is only used for tool_ids the
+    # registry does not know.
+    options = data.get('options')
+    prompt = build_system_prompt(tool_id, options if isinstance(options, dict) else None)
+    if prompt is None:
+        prompt = data.get('prompt') or 'Please process the following text:'
+    return prompt
+
+def completion_messages(prompt, text):
+    return [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": text}
+    ]
+
+def make_cache_key(params, prompt, text):
+    payload = json.dumps([params, prompt, text], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    # Two-tier cache of completion outputs. The memory tier is an LRU bounded
+    # by entry count and total bytes; the optional disk tier is a directory of
+    # one JSON file per key, trimmed oldest-first to a byte budget. Both tiers
+    # drop entries older than the TTL on read. Disk reads and writes run in
+    # worker threads, so get and put are coroutines that never block the
+    # event loop on file I/O.
+    def __init__(self, max_entries, max_bytes, ttl, disk_dir='', disk_max_bytes=0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.disk_index = None
+        self.disk_bytes = 0
+        self.disk_ready = threading.Event()
+        self.lock = threading.Lock()
+        self.counters = {
+            'hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'disk_evictions': 0,
+            'expired': 0
+        }
+        if disk_dir:
+            # The index is built from the directory, so entries survive a
+            # host restart; walking a large cache takes a while, so it is
+            # done once, on a background thread, at startup
+            threading.Thread(target=self._load_disk_index, name='response-cache-index', daemon=True).start()
+    
+    async def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, value, _ = entry
+                if expires_at > now:
+                    self.entries.move_to_end(key)
+                    self.counters['hits'] += 1
+                    return value
+                self._drop(key)
+                self.counters['expired'] += 1
+        
+        if self.disk_dir:
+            value = await asyncio.to_thread(self._disk_get, key, now)
+            if value is not None:
+                with self.lock:
+                    self.counters['disk_hits'] += 1
+                    self._store(key, value, now)
+                return value
+        
+        with self.lock:
+            self.counters['misses'] += 1
+        return None
+    
+    async def put(self, key, value):
+        now = time.time()
+        with self.lock:
+            self._store(key, value, now)
+        if self.disk_dir:
+            await asyncio.to_thread(self._disk_put, key, value, now)
+    
+    def stats(self):
+        # Disk figures are None until the startup index is built
+        with self.lock:
+            return {
+                **self.counters,
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'disk_entries': len(self.disk_index) if self.disk_index is not None else None,
+                'disk_bytes': self.disk_bytes if self.disk_index is not None else None
+            }
+    
+    def _store(self, key, value, now):
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self._drop(key)
+        self.entries[key] = (now + self.ttl, value, size)
+        self.bytes += size
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self._drop(oldest)
+            self.counters['evictions'] += 1
+    
+    def _drop(self, key):
+        _, _, size = self.entries.pop(key)
+        self.bytes -= size
+    
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + '.json')
+    
+    def _load_disk_index(self):
+        found = []
+        try:
+            for root, _, files in os.walk(self.disk_dir):
+                for name in files:
+                    if name.endswith('.json'):
+                        try:
+                            stat = os.stat(os.path.join(root, name))
+                        except OSError:
+                            continue
+                        found.append((stat.st_mtime, name[:-5], stat.st_size))
+        finally:
+            found.sort()
+            with self.lock:
+                self.disk_index = OrderedDict((key, size) for _, key, size in found)
+                self.disk_bytes = sum(size for _, _, size in found)
+            self.disk_ready.set()
+    
+    # The _disk_* methods run in worker threads
+    
+    def _disk_get(self, key, now):
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record.get('expires_at', 0) > now:
+            return record.get('value')
+        with self.lock:
+            if self.disk_index is not None:
+                self.disk_bytes -= self.disk_index.pop(key, 0)
+            self.counters['expired'] += 1
+        self._disk_remove(key)
+        return None
+    
+    def _disk_put(self, key, value, now):
+        data = json.dumps({'expires_at': now + self.ttl, 'value': value}).encode('utf-8')
+        if len(data) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning('Response cache disk write failed: %s', e)
+            return
+        
+        # Files are removed after the lock is released, so the event loop
+        # never waits on the lock for file I/O
+        self.disk_ready.wait()
+        evicted = []
+        with self.lock:
+            self.disk_bytes -= self.disk_index.pop(key, 0)
+            self.disk_index[key] = len(data)
+            self.disk_bytes += len(data)
+            while self.disk_bytes > self.disk_max_bytes and self.disk_index:
+                oldest, size = self.disk_index.popitem(last=False)
+                self.disk_bytes -= size
+                evicted.append(oldest)
+                self.counters['disk_evictions'] += 1
+        for oldest in evicted:
+            self._disk_remove(oldest)
+    
+    def _disk_remove(self, key):
+        try:
+            os.remove(self._disk_path(key))
+        except OSError:
+            pass
+
+response_cache = ResponseCache(
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_MAX_BYTES,
+    LLM_CACHE_TTL,
+    LLM_CACHE_DIR,
+    LLM_CACHE_DISK_MAX_BYTES
+)
+
+OPENAI_RPM_LIMIT = int(os.getenv('OPENAI_RPM_LIMIT', 500))
+OPENAI_TPM_LIMIT = int(os.getenv('OPENAI_TPM_LIMIT', 200000))
+RATE_LIMIT_QUEUE_SIZE = int(os.getenv('RATE_LIMIT_QUEUE_SIZE', 100))
+RATE_LIMIT_MAX_WAIT = float(os.getenv('RATE_LIMIT_MAX_WAIT', 30))
+
+# Lower runs first when requests queue for upstream capacity: short
+# interactive tools ahead of rewrites, long generators last.
+TOOL_PRIORITIES = {
+    'tag-recommender': 0,
+    'title-recommender': 0,
+    'seo-description-generator': 0,
+    'proofreading': 1,
+    'paraphrasing': 1,
+    'ai-humanizer': 1,
+    'split-sentence': 1,
+    'word-choice-optimization': 1,
+    'change-tone': 1,
+    'change-voice': 1,
+    'change-speech': 1,
+    'make-longer-shorter': 1,
+    'language-translation': 1,
+    'ai-summarizer': 2,
+    'outline-generation': 2,
+    'table-generator': 2,
+    'faq-generator': 2,
+    'glossary-generator': 2
+}
+DEFAULT_PRIORITY = 1
+
+class RateLimitExceeded(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f'Too many requests; retry after {retry_after} seconds.')
+        self.retry_after = retry_after
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated = time.monotonic()
+    
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, amount):
+        # A single request larger than the bucket waits for a full bucket
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+    
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+class RateLimiter:
+    # Requests-per-minute and tokens-per-minute token buckets in front of the
+    # OpenAI call. Callers that cannot start immediately wait in a bounded
+    # priority queue; when the queue is full or the projected wait exceeds
+    # max_wait they are rejected at once with a Retry-After hint.
+    def __init__(self, rpm, tpm, max_queue, max_wait):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.queue = []
+        self.sequence = itertools.count()
+        self.timer = None
+    
+    def _demands(self, requests, tokens):
+        return [
+            (bucket, amount)
+            for bucket, amount in ((self.requests, requests), (self.tokens, tokens))
+            if bucket is not None
+        ]
+    
+    def _wait_time(self, tokens, now):
+        wait = 0.0
+        for bucket, amount in self._demands(1, tokens):
+            bucket.refill(now)
+            wait = max(wait, bucket.wait_time(amount))
+        return wait
+    
+    def _take(self, tokens):
+        for bucket, amount in self._demands(1, tokens):
+            bucket.take(amount)
+    
+    def _projected_wait(self, tokens, now):
+        # Time until the buckets have refilled enough for everything queued
+        # plus this request; as in wait_time, no single request counts for
+        # more than a full bucket
+        pending = [tokens] + [entry[2] for entry in self.queue if not entry[3].done()]
+        wait = 0.0
+        for bucket, amounts in self._demands([1] * len(pending), pending):
+            bucket.refill(now)
+            demand = sum(min(amount, bucket.capacity) for amount in amounts)
+            wait = max(wait, (demand - bucket.level) / bucket.rate)
+        return wait
+    
+    async def acquire(self, tokens, priority=DEFAULT_PRIORITY):
+        if self.requests is None and self.tokens is None:
+            return
+        now = time.monotonic()
+        if not self.queue and self._wait_time(tokens, now) == 0:
+            self._take(tokens)
+            return
+        
+        projected = self._projected_wait(tokens, now)
+        if len(self.queue) >= self.max_queue or projected > self.max_wait:
+            raise RateLimitExceeded(max(1, math.ceil(projected)))
+        
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.queue, (priority, next(self.sequence), tokens, future))
+        self._drain()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # A cancelled waiter stays in the heap and is skipped by _drain
+            future.cancel()
+            raise
+    
+    def try_acquire(self, tokens):
+        # Non-blocking variant for optional work such as hedged requests
+        if self.requests is None and self.tokens is None:
+            return True
+        if self.queue or self._wait_time(tokens, time.monotonic()) > 0:
+            return False
+        self._take(tokens)
+        return True
+    
+    def _drain(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        while self.queue:
+            _, _, tokens, future = self.queue[0]
+            if future.done():
+                heapq.heappop(self.queue)
+                continue
+            wait = self._wait_time(tokens, time.monotonic())
+            if wait > 0:
+                self.timer = future.get_loop().call_later(wait, self._drain)
+                return
+            heapq.heappop(self.queue)
+            self._take(tokens)
+            future.set_result(None)
+
+rate_limiter = RateLimiter(OPENAI_RPM_LIMIT, OPENAI_TPM_LIMIT, RATE_LIMIT_QUEUE_SIZE, RATE_LIMIT_MAX_WAIT)
+
+def retry_after_seconds(error):
+    # Upstream 429s usually say how long to back off
+    response = getattr(error, 'response', None)
+    value = response.headers.get('retry-after') if response is not None else None
+    try:
+        return max(1, math.ceil(float(value)))
+    except (TypeError, ValueError):
+        return 1
+
+DEFAULT_LATENCY_BUDGET = float(os.getenv('DEFAULT_LATENCY_BUDGET', 45))
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', 2))
+RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', 0.5))
+RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', 8))
+HEDGE_ENABLED = os.getenv('HEDGE_ENABLED', 'false').lower() == 'true'
+HEDGE_QUANTILE = float(os.getenv('HEDGE_QUANTILE', 0.95))
+HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', 20))
+LATENCY_WINDOW = int(os.getenv('LATENCY_WINDOW', 200))
+# Streams must produce their first token within this many seconds (or the
+# tool's latency budget, if shorter) and finish within the latency budget
+STREAM_FIRST_TOKEN_TIMEOUT = float(os.getenv('STREAM_FIRST_TOKEN_TIMEOUT', 15))
+
+def parse_latency_budgets(raw):
+    # A malformed setting is logged and ignored rather than failing the
+    # import, which would take every route down with it
+    if not raw:
+        return {}
+    try:
+        budgets = json.loads(raw)
+        if not isinstance(budgets, dict) or not all(
+            isinstance(seconds, (int, float)) and not isinstance(seconds, bool) and seconds > 0
+            for seconds in budgets.values()
+        ):
+            raise ValueError('expected a JSON object of tool_id -> positive seconds')
+    except ValueError as e:
+        logging.error('Ignoring TOOL_LATENCY_BUDGETS, using the default budgets: %s', e)
+        return {}
+    return budgets
+
+# Hard deadline in seconds for a completion, including retries and hedges.
+# TOOL_LATENCY_BUDGETS (a JSON object of tool_id -> seconds) overrides these.
+TOOL_LATENCY_BUDGETS = {
+    'tag-recommender': 20,
+    'title-recommender': 20,
+    'seo-description-generator': 20,
+    'ai-summarizer': 60,
+    'outline-generation': 60,
+    'table-generator': 60,
+    'faq-generator': 60,
+    'glossary-generator': 60,
+    **parse_latency_budgets(os.getenv('TOOL_LATENCY_BUDGETS', ''))
+}
+
+class LatencyTracker:
+    # Rolling window of successful attempt latencies per tool, used to pick
+    # the hedging delay, plus per-tool attempt outcome counters.
+    def __init__(self, window):
+        self.window = window
+        self.samples = {}
+        self.counters = {}
+    
+    def record_attempt(self, tool_id, latency, outcome, hedged):
+        counters = self.counters.setdefault(tool_id, {})
+        key = 'hedge_' + outcome if hedged else outcome
+        counters[key] = counters.get(key, 0) + 1
+        if outcome == 'ok':
+            self.samples.setdefault(tool_id, deque(maxlen=self.window)).append(latency)
+    
+    def count(self, tool_id, name):
+        counters = self.counters.setdefault(tool_id, {})
+        counters[name] = counters.get(name, 0) + 1
+    
+    def quantile(self, tool_id, q):
+        samples = self.samples.get(tool_id)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    
+    def hedge_delay(self, tool_id):
+        if not HEDGE_ENABLED or len(self.samples.get(tool_id, ())) < HEDGE_MIN_SAMPLES:
+            return None
+        return self.quantile(tool_id, HEDGE_QUANTILE)
+    
+    def stats(self):
+        return {
+            tool_id: {
+                **counters,
+                'p50': self.quantile(tool_id, 0.5),
+                'p95': self.quantile(tool_id, 0.95),
+                'p99': self.quantile(tool_id, 0.99)
+            }
+            for tool_id, counters in self.counters.items()
+        }
+
+latency_tracker = LatencyTracker(LATENCY_WINDOW)
+
+def is_transient_error(error):
+    if openai is None:
+        return False
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    status_code = getattr(error, 'status_code', None)
+    return isinstance(error, openai.APIStatusError) and status_code is not None and (status_code in (408, 409) or status_code >= 500)
+
+async def timed_attempt(client, tool_id, params, messages, hedged):
+    started = time.perf_counter()
+    outcome = 'ok'
+    try:
+        return await client.chat.completions.create(messages=messages, **params)
+    except asyncio.CancelledError:
+        outcome = 'cancelled'
+        raise
+    except Exception as e:
+        outcome = type(e).__name__
+        raise
+    finally:
+        latency = time.perf_counter() - started
+        latency_tracker.record_attempt(tool_id, latency, outcome, hedged)
+        record_count('upstream_attempts')
+        logging.info('OpenAI attempt tool=%s hedged=%s outcome=%s latency_ms=%.1f', tool_id, hedged, outcome, latency * 1000)
+
+async def hedged_attempt(client, tool_id, params, messages, tokens):
+    # Starts a second identical request if the first is still running at the
+    # tool's hedging quantile; whichever succeeds first wins.
+    tasks = [asyncio.ensure_future(timed_attempt(client, tool_id, params, messages, False))]
+    try:
+        hedge_after = latency_tracker.hedge_delay(tool_id)
+        if hedge_after is not None:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done and rate_limiter.try_acquire(tokens):
+                latency_tracker.count(tool_id, 'hedges')
+                tasks.append(asyncio.ensure_future(timed_attempt(client, tool_id, params, messages, True)))
+        
+        error = None
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if len(tasks) > 1 and task is tasks[1]:
+                        latency_tracker.count(tool_id, 'hedge_wins')
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+async def resilient_completion(api_key, tool_id, params, messages, tokens):
+    loop = asyncio.get_running_loop()
+    budget = TOOL_LATENCY_BUDGETS.get(tool_id, DEFAULT_LATENCY_BUDGET)
+    deadline = loop.time() + budget
+    client = get_async_openai_client(api_key)
+    attempt = 0
+    
+    while True:
+        attempt += 1
+        try:
+            if attempt > 1:
+                # A retry is another outbound call, so it passes the RPM/TPM
+                # buckets like the first attempt did
+                await asyncio.wait_for(
+                    rate_limiter.acquire(tokens, TOOL_PRIORITIES.get(tool_id, DEFAULT_PRIORITY)),
+                    max(0.0, deadline - loop.time())
+                )
+            return await asyncio.wait_for(
+                hedged_attempt(client, tool_id, params, messages, tokens),
+                max(0.0, deadline - loop.time())
+            )
+        except asyncio.TimeoutError:
+            latency_tracker.count(tool_id, 'deadline_exceeded')
+            raise asyncio.TimeoutError(f'{tool_id} did not finish within its {budget:g}s latency budget.')
+        except Exception as e:
+            if attempt > OPENAI_MAX_RETRIES or not is_transient_error(e):
+                raise
+            # Full jitter keeps retries from synchronising across requests
+            delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+            if is_upstream_rate_limit(e):
+                delay = max(delay, retry_after_seconds(e))
+            if loop.time() + delay >= deadline:
+                raise
+            latency_tracker.count(tool_id, 'retries')
+            await asyncio.sleep(delay)
+
+COALESCE_WAIT_TIMEOUT = float(os.getenv('COALESCE_WAIT_TIMEOUT', 120))
+
+# cache key -> future of the leader call for that key on this event loop
+_inflight_completions = {}
+
+async def coalesced(key, call):
+    # Single-flight: the first caller for a key runs call(); identical callers
+    # arriving meanwhile wait on its future instead of issuing their own.
+    loop = asyncio.get_running_loop()
+    leader = _inflight_completions.get(key)
+    if leader is not None and leader.get_loop() is loop:
+        try:
+            result = await asyncio.wait_for(asyncio.shield(leader), COALESCE_WAIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise asyncio.TimeoutError('Timed out waiting for an identical in-flight request.')
+        return result, True
+    
+    future = loop.create_future()
+    _inflight_completions[key] = future
+    try:
+        result = await call()
+    except BaseException as e:
+        if isinstance(e, asyncio.CancelledError):
+            e = RuntimeError('The identical in-flight request was cancelled.')
+        future.set_exception(e)
+        # Mark retrieved so a leader without followers does not log a warning
+        future.exception()
+        raise
+    else:
+        future.set_result(result)
+        return result, False
+    finally:
+        if _inflight_completions.get(key) is future:
+            del _inflight_completions[key]
+
+async def cached_completion(api_key, tool_id, prompt, text, prompt_tokens, max_tokens):
+    params = completion_params(max_tokens)
+    cache_key = make_cache_key(params, prompt, text)
+    output = await response_cache.get(cache_key)
+    if output is not None:
+        return output, 'HIT'
+    
+    async def fetch():
+        with timed_stage('queue'):
+            await rate_limiter.acquire(prompt_tokens + max_tokens, TOOL_PRIORITIES.get(tool_id, DEFAULT_PRIORITY))
+        with timed_stage('upstream'):
+            response = await resilient_completion(
+                api_key,
+                tool_id,
+                params,
+                completion_messages(prompt, text),
+                prompt_tokens + max_tokens
+            )
+        if response.usage is not None:
+            record_count('prompt_tokens', response.usage.prompt_tokens)
+            record_count('completion_tokens', response.usage.completion_tokens)
+        output = response.choices[0].message.content
+        if output is not None and response.choices[0].finish_reason == 'stop':
+            await response_cache.put(cache_key, output)
+        return output
+    
+    output, shared = await coalesced(cache_key, fetch)
+    return output, 'COALESCED' if shared else 'MISS'
+
+# Inputs are only split when a single call cannot hold them and their full
+# output. Chunks are LONG_INPUT_CHUNK_CHARS long, or longer when that would
+# make more than LONG_INPUT_MAX_CHUNKS of them: at the default concurrency
+# that is two rounds of map calls, which with the reduce step stays within
+# the 230s HTTP timeout.
+LONG_INPUT_CHUNK_CHARS = int(os.getenv('LONG_INPUT_CHUNK_CHARS', 8000))
+LONG_INPUT_CONCURRENCY = int(os.getenv('LONG_INPUT_CONCURRENCY', 8))
+LONG_INPUT_MAX_CHUNKS = int(os.getenv('LONG_INPUT_MAX_CHUNKS', 16))
+
+# Tools whose per-chunk outputs are merged by a final model call
+REDUCE_PROMPTS = {
+    'ai-summarizer': "The following are summaries of consecutive sections of one document. Combine them into a single concise summary of the whole document, retaining all key information:",
+    'glossary-generator': "The following are glossaries generated from consecutive sections of one document. Merge them into a single alphabetical glossary, removing duplicate terms and combining their definitions:",
+    'faq-generator': "The following are FAQ lists generated from consecutive sections of one document. Merge them into a single FAQ list, removing duplicate or overlapping questions:"
+}
+
+# Tools that rewrite text in place, so per-chunk outputs are simply joined
+JOIN_TOOLS = {
+    'proofreading',
+    'paraphrasing',
+    'ai-humanizer',
+    'split-sentence',
+    'language-translation',
+    'word-choice-optimization',
+    'change-tone',
+    'change-voice',
+    'change-speech'
+}
+
+def split_sentences(paragraph):
+    start = 0
+    for match in _SENTENCE_END_RE.finditer(paragraph):
+        yield paragraph[start:match.end()].strip()
+        start = match.end()
+    if paragraph[start:].strip():
+        yield paragraph[start:].strip()
+
+def split_long_piece(piece, max_chars):
+    # Last resort for a single sentence longer than a chunk: cut at whitespace
+    while len(piece) > max_chars:
+        cut = piece.rfind(' ', 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        yield piece[:cut]
+        piece = piece[cut:].lstrip()
+    if piece:
+        yield piece
+
+def split_text_chunks(text, max_chars):
+    # Paragraphs and sentences are split the same way count_paragraphs and
+    # count_sentences count them; pieces are packed greedily up to max_chars.
+    chunks = []
+    current = ''
+    
+    for line in text.split('\n'):
+        paragraph = line.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces = [paragraph]
+        else:
+            pieces = [
+                piece
+                for sentence in split_sentences(paragraph)
+                for piece in split_long_piece(sentence, max_chars)
+            ]
+        
+        separator = '\n\n'
+        for piece in pieces:
+            if current and len(current) + len(separator) + len(piece) > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = current + separator + piece if current else piece
+            separator = ' '
+    
+    if current:
+        chunks.append(current)
+    return chunks
+
+REDUCE_SEPARATOR = '\n\n---\n\n'
+
+def pack_reduce_groups(tool_id, outputs):
+    # Consecutive outputs are packed greedily into groups whose merge fits
+    # the context window
+    groups = []
+    for output in outputs:
+        if groups and plan_completion(tool_id, REDUCE_PROMPTS[tool_id], REDUCE_SEPARATOR.join(groups[-1] + [output]))[1]:
+            groups[-1].append(output)
+        else:
+            groups.append([output])
+    return groups
+
+async def reduce_outputs(api_key, tool_id, outputs, semaphore):
+    # Outputs that do not fit one reduce call are merged in stages: each
+    # group that fits is reduced, then the group results are merged again.
+    # Returns the output and whether every reduce call was a cache hit.
+    prompt = REDUCE_PROMPTS[tool_id]
+    statuses = []
+    
+    async def run_group(group):
+        if len(group) == 1:
+            return group[0]
+        reduce_text = REDUCE_SEPARATOR.join(group)
+        prompt_tokens, max_tokens = plan_completion(tool_id, prompt, reduce_text)
+        async with semaphore:
+            output, status = await cached_completion(api_key, tool_id, prompt, reduce_text, prompt_tokens, max_tokens)
+        statuses.append(status)
+        return output or ''
+    
+    while True:
+        groups = pack_reduce_groups(tool_id, outputs)
+        if len(groups) == len(outputs):
+            raise InputTooLarge('Input is too large: the results for its sections are too long to combine in one context window.')
+        outputs = await asyncio.gather(*(run_group(group) for group in groups))
+        if len(outputs) == 1:
+            return outputs[0], all(status == 'HIT' for status in statuses)
+
+def needs_long_input(tool_id, text, max_tokens):
+    # True when a single call would be rejected or would cut the tool's
+    # output short, and the tool can be split into chunks
+    if tool_id not in REDUCE_PROMPTS and tool_id not in JOIN_TOOLS:
+        return False
+    base, ratio = TOOL_OUTPUT_BUDGETS.get(tool_id, DEFAULT_OUTPUT_BUDGET)
+    return max_tokens < base + math.ceil(ratio * estimate_tokens(text))
+
+def split_long_input(text):
+    # Chunks grow past LONG_INPUT_CHUNK_CHARS until there are at most
+    # LONG_INPUT_MAX_CHUNKS of them
+    chunk_chars = max(LONG_INPUT_CHUNK_CHARS, math.ceil(len(text) / LONG_INPUT_MAX_CHUNKS))
+    chunks = split_text_chunks(text, chunk_chars)
+    while len(chunks) > LONG_INPUT_MAX_CHUNKS:
+        chunk_chars += chunk_chars // 4
+        chunks = split_text_chunks(text, chunk_chars)
+    return chunks
+
+async def long_input_completion(api_key, tool_id, prompt, text):
+    chunks = split_long_input(text)
+    plans = [plan_completion(tool_id, prompt, chunk) for chunk in chunks]
+    # Every chunk must fit one call with room for its whole output
+    if any(needs_long_input(tool_id, chunk, max_tokens) for chunk, (_, max_tokens) in zip(chunks, plans)):
+        raise InputTooLarge(input_too_large_message(plan_completion(tool_id, prompt, text)[0]))
+    semaphore = asyncio.Semaphore(LONG_INPUT_CONCURRENCY)
+    
+    async def run_chunk(chunk, plan):
+        prompt_tokens, max_tokens = plan
+        async with semaphore:
+            return await cached_completion(api_key, tool_id, prompt, chunk, prompt_tokens, max_tokens)
+    
+    results = await asyncio.gather(*(run_chunk(chunk, plan) for chunk, plan in zip(chunks, plans)))
+    outputs = [output or '' for output, _ in results]
+    cache_status = 'HIT' if all(status == 'HIT' for _, status in results) else 'MISS'
+    
+    if tool_id not in REDUCE_PROMPTS or len(outputs) == 1:
+        return '\n\n'.join(outputs), cache_status
+    
+    output, reduce_hit = await reduce_outputs(api_key, tool_id, outputs, semaphore)
+    return output, cache_status if reduce_hit else 'MISS'
+
+@buffered_routes.route(route="utilities")
+async def utilities(req: func.HttpRequest) -> func.HttpResponse:
+    return await instrumented(handle_utilities, req)
+
+@compressed_responses
+async def handle_utilities(req: func.HttpRequest) -> func.HttpResponse:
+    if req.method != 'POST':
         return func.HttpResponse(
             'Method Not Allowed',
             status_code=405
         )
+    
+    # Plain-text bodies are analyzed incrementally without building one
+    # large string or JSON document; the tool is picked by query parameter.
+    if req.headers.get('Content-Type', '').startswith('text/plain'):
+        return await analyze_text_body(req)
+    
     try:
-        data = req.get_json()
+        with timed_stage('parse'):
+            data = req.get_json()
         text = data.get('text', '')
-        prompt = data.get('prompt', '')
         tool_id = data.get('tool_id', '')
+        prompt = resolve_prompt(tool_id, data)
+        record_field('tool_id', tool_id)
+        record_field('input_chars', len(text))
         
         if not text.strip():
             return func.HttpResponse(
@@ -728,24 +2791,22 @@ def utilities(req: func.HttpRequest) -> func.HttpResponse:
                 mimetype='application/json'
             )
         
-        # Handle Python-based tools
-        if tool_id == 'count-analyzer':
-            analysis_data = analyze_content(text)
-            html_response = generate_html_response(analysis_data, 'count-analyzer')
-            return func.HttpResponse(
-                html_response,
-                status_code=200,
-                mimetype='text/html'
-            )
-        
-        elif tool_id == 'readability-score':
-            readability_data = analyze_readability(text)
-            html_response = generate_html_response(readability_data, 'readability-score')
-            return func.HttpResponse(
-                html_response,
-                status_code=200,
-                mimetype='text/html'
-            )
+        # Handle Python-based tools; the analyzers are CPU-bound, so they run
+        # in a worker thread to keep the event loop free for LLM calls
+        if tool_id in ANALYZERS:
+            output_format = negotiate_format(req, data.get('format'))
+            if output_format is None:
+                return unsupported_format_response()
+            if tool_id == 'readability-score' and data.get('detail'):
+                page = parse_detail_page(data.get('offset'), data.get('limit'))
+                if page is None:
+                    return invalid_page_response()
+                with timed_stage('analyze'):
+                    analysis_data = await asyncio.to_thread(analyze_readability_detail, [text], *page)
+                return detail_response(analysis_data, output_format)
+            with timed_stage('analyze'):
+                analysis_data = await asyncio.to_thread(ANALYZERS[tool_id], text)
+            return analysis_response(req, analysis_data, tool_id, output_format)
         
         # Handle OpenAI-based tools for all other cases
         openai_api_key = os.getenv('OPENAI_API_KEY')
@@ -756,26 +2817,386 @@ def utilities(req: func.HttpRequest) -> func.HttpResponse:
                 mimetype='application/json'
             )
         
-        openai_client = openai.OpenAI(api_key=openai_api_key)
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": text}
-            ],
-            max_tokens=1000,
-            temperature=0
-        )
-        output = response.choices[0].message.content
+        prompt_tokens, max_tokens = plan_completion(tool_id, prompt, text)
+        if needs_long_input(tool_id, text, max_tokens):
+            output, cache_status = await long_input_completion(openai_api_key, tool_id, prompt, text)
+        else:
+            # Reject inputs that cannot fit the context window before paying
+            # for a network round trip
+            if not max_tokens:
+                return func.HttpResponse(
+                    json.dumps({'error': input_too_large_message(prompt_tokens)}),
+                    status_code=413,
+                    mimetype='application/json'
+                )
+            output, cache_status = await cached_completion(openai_api_key, tool_id, prompt, text, prompt_tokens, max_tokens)
+        record_field('cache', cache_status)
         return func.HttpResponse(
             json.dumps({'content': output}),
             status_code=200,
+            headers={'X-Cache': cache_status},
             mimetype='application/json'
         )
         
+    except InputTooLarge as e:
+        return func.HttpResponse(
+            json.dumps({'error': str(e)}),
+            status_code=413,
+            mimetype='application/json'
+        )
+        
+    except RateLimitExceeded as e:
+        return func.HttpResponse(
+            json.dumps({'error': str(e)}),
+            status_code=429,
+            headers={'Retry-After': str(e.retry_after)},
+            mimetype='application/json'
+        )
+    
+    except asyncio.TimeoutError as e:
+        return func.HttpResponse(
+            json.dumps({'error': str(e) or 'Upstream request timed out.'}),
+            status_code=504,
+            mimetype='application/json'
+        )
+    
     except Exception as e:
+        if is_upstream_rate_limit(e):
+            return func.HttpResponse(
+                json.dumps({'error': 'The language model is busy; please retry shortly.'}),
+                status_code=429,
+                headers={'Retry-After': str(retry_after_seconds(e))},
+                mimetype='application/json'
+            )
         return func.HttpResponse(
             json.dumps({'error': str(e)}),
             status_code=500,
             mimetype='application/json'
         )
+
+@functools.lru_cache(maxsize=None)
+def analyzer_css_body(encoding):
+    # The stylesheet never changes while the app runs, so each encoding is
+    # compressed once, at the highest level
+    body = ANALYZER_CSS.encode('utf-8')
+    if encoding is None:
+        return body
+    return compress_body(body, encoding, 11 if encoding == 'br' else 9)
+
+@buffered_routes.route(route="utilities/analyzer.css", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
+def utilities_css(req: func.HttpRequest) -> func.HttpResponse:
+    encoding = negotiate_encoding(req) if COMPRESSION_ENABLED else None
+    headers = {
+        # Each encoding is a separate representation with its own ETag
+        'ETag': ANALYZER_CSS_ETAG if encoding is None else f'"{ANALYZER_CSS_VERSION}-{encoding}"',
+        'Cache-Control': 'public, max-age=31536000, immutable',
+        'Access-Control-Allow-Origin': '*',
+        'Vary': 'Accept-Encoding'
+    }
+    # Any copy of this version is still current, whatever its encoding
+    if ANALYZER_CSS_VERSION in req.headers.get('If-None-Match', ''):
+        return func.HttpResponse(status_code=304, headers=headers)
+    if encoding is not None:
+        headers['Content-Encoding'] = encoding
+    return func.HttpResponse(
+        analyzer_css_body(encoding),
+        status_code=200,
+        headers=headers,
+        mimetype='text/css'
+    )
+
+@buffered_routes.route(route="utilities/cache", methods=["GET"])
+def utilities_cache(req: func.HttpRequest) -> func.HttpResponse:
+    return func.HttpResponse(
+        json.dumps(response_cache.stats()),
+        status_code=200,
+        mimetype='application/json'
+    )
+
+@buffered_routes.route(route="utilities/latency", methods=["GET"])
+def utilities_latency(req: func.HttpRequest) -> func.HttpResponse:
+    return func.HttpResponse(
+        json.dumps(latency_tracker.stats()),
+        status_code=200,
+        mimetype='application/json'
+    )
+
+@buffered_routes.route(route="utilities/startup", methods=["GET"])
+def utilities_startup(req: func.HttpRequest) -> func.HttpResponse:
+    return func.HttpResponse(
+        json.dumps({
+            **startup_timings,
+            'llm_stack_loaded': openai is not None
+        }),
+        status_code=200,
+        mimetype='application/json'
+    )
+
+@buffered_routes.route(route="utilities/batch")
+def utilities_batch(req: func.HttpRequest) -> func.HttpResponse:
+    if req.method != 'POST':
+        return func.HttpResponse(
+            'Method Not Allowed',
+            status_code=405
+        )
+    try:
+        data = req.get_json()
+        items = data.get('items') if isinstance(data, dict) else data
+        
+        if not isinstance(items, list) or not items:
+            return func.HttpResponse(
+                json.dumps({'error': 'No items provided.'}),
+                status_code=400,
+                mimetype='application/json'
+            )
+        if len(items) > BATCH_MAX_ITEMS:
+            return func.HttpResponse(
+                json.dumps({'error': f'Too many items; the limit is {BATCH_MAX_ITEMS}.'}),
+                status_code=413,
+                mimetype='application/json'
+            )
+        
+        return compress_response(req, func.HttpResponse(
+            json.dumps({'results': analyze_batch(items)}),
+            status_code=200,
+            mimetype='application/json'
+        ))
+        
+    except Exception as e:
+        return func.HttpResponse(
+            json.dumps({'error': str(e)}),
+            status_code=500,
+            mimetype='application/json'
+        )
+
+@buffered_routes.route(route="utilities/session", methods=["POST"])
+async def utilities_session(req: func.HttpRequest) -> func.HttpResponse:
+    return await instrumented(handle_session, req)
+
+@compressed_responses
+async def handle_session(req: func.HttpRequest) -> func.HttpResponse:
+    # Live re-analysis of a document being edited. The first request sends
+    # {document_id, tool_id, text}; later ones send {document_id, tool_id,
+    # version, changes: [{start, delete, insert: [paragraphs]}]} against the
+    # version returned in X-Document-Version, and only the inserted
+    # paragraphs are analyzed.
+    try:
+        with timed_stage('parse'):
+            data = req.get_json()
+        document_id = data.get('document_id')
+        tool_id = data.get('tool_id', '')
+        record_field('tool_id', tool_id)
+        
+        if not isinstance(document_id, str) or not document_id:
+            return func.HttpResponse(
+                json.dumps({'error': 'No document_id provided.'}),
+                status_code=400,
+                mimetype='application/json'
+            )
+        if tool_id not in ANALYZERS:
+            return func.HttpResponse(
+                json.dumps({'error': 'Sessions are only supported for count-analyzer and readability-score.'}),
+                status_code=400,
+                mimetype='application/json'
+            )
+        output_format = negotiate_format(req, data.get('format'))
+        if output_format is None:
+            return unsupported_format_response()
+        
+        with timed_stage('analyze'):
+            if 'text' in data:
+                if not isinstance(data['text'], str):
+                    raise ValueError('text must be a string.')
+                if not data['text'].strip():
+                    return func.HttpResponse(
+                        json.dumps({'error': 'No text provided.'}),
+                        status_code=400,
+                        mimetype='application/json'
+                    )
+                record_field('input_chars', len(data['text']))
+                counts, version, computed, total = await asyncio.to_thread(session_store.start, document_id, data['text'])
+            else:
+                changes = parse_changes(data.get('changes'))
+                counts, version, computed, total = await asyncio.to_thread(
+                    session_store.edit, document_id, data.get('version'), changes
+                )
+            analysis_data = session_analysis(tool_id, counts)
+        record_count('paragraphs_computed', computed)
+        record_count('paragraphs_reused', total - computed)
+        
+        response = analysis_response(req, analysis_data, tool_id, output_format)
+        response.headers['X-Document-Version'] = str(version)
+        response.headers['X-Paragraphs-Computed'] = str(computed)
+        return response
+    
+    except SessionConflict as e:
+        return func.HttpResponse(
+            json.dumps({'error': str(e), 'version': e.version}),
+            status_code=409,
+            mimetype='application/json'
+        )
+    except ValueError as e:
+        return func.HttpResponse(
+            json.dumps({'error': str(e)}),
+            status_code=400,
+            mimetype='application/json'
+        )
+    except Exception as e:
+        return func.HttpResponse(
+            json.dumps({'error': str(e)}),
+            status_code=500,
+            mimetype='application/json'
+        )
+
+if not HTTP_STREAMS_ENABLED:
+    app.register_functions(buffered_routes)
+
+# Streaming responses need the FastAPI HTTP extension for Python Functions
+# (azurefunctions-extensions-http-fastapi). It is imported only when streams
+# are enabled, since importing it is what switches the worker's HTTP mode;
+# if it is missing the deployment serves no routes and logs why.
+Request = None
+if HTTP_STREAMS_ENABLED:
+    try:
+        from azurefunctions.extensions.http.fastapi import Request, StreamingResponse, JSONResponse
+    except ImportError:
+        logging.error('HTTP_STREAMS_ENABLED is set but azurefunctions-extensions-http-fastapi is not installed.')
+
+def encode_stream_frame(frame, stream_format, event=None):
+    payload = json.dumps(frame, separators=(',', ':'))
+    if stream_format == 'ndjson':
+        return payload + '\n'
+    if event:
+        return f'event: {event}\ndata: {payload}\n\n'
+    return f'data: {payload}\n\n'
+
+def usage_frame(usage, finish_reason, cache_status):
+    return {
+        'done': True,
+        'finish_reason': finish_reason,
+        'cache': cache_status,
+        'usage': {
+            'prompt_tokens': usage.prompt_tokens,
+            'completion_tokens': usage.completion_tokens,
+            'total_tokens': usage.total_tokens
+        } if usage is not None else None
+    }
+
+async def stream_completion(api_key, tool_id, prompt, text, max_tokens, stream_format):
+    params = completion_params(max_tokens)
+    cache_key = make_cache_key(params, prompt, text)
+    output = await response_cache.get(cache_key)
+    if output is not None:
+        yield encode_stream_frame({'content': output}, stream_format)
+        yield encode_stream_frame(usage_frame(None, 'stop', 'HIT'), stream_format, 'done')
+        return
+    
+    loop = asyncio.get_running_loop()
+    budget = TOOL_LATENCY_BUDGETS.get(tool_id, DEFAULT_LATENCY_BUDGET)
+    first_token_timeout = min(budget, STREAM_FIRST_TOKEN_TIMEOUT)
+    deadline = loop.time() + budget
+    first_token_deadline = loop.time() + first_token_timeout
+    parts = []
+    usage = None
+    finish_reason = None
+    stream = None
+    try:
+        openai_client = get_async_openai_client(api_key)
+        stream = await asyncio.wait_for(
+            openai_client.chat.completions.create(
+                messages=completion_messages(prompt, text),
+                stream=True,
+                stream_options={'include_usage': True},
+                **params
+            ),
+            max(0.0, first_token_deadline - loop.time())
+        )
+        chunks = stream.__aiter__()
+        while True:
+            remaining = (deadline if parts else first_token_deadline) - loop.time()
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), max(0.0, remaining))
+            except StopAsyncIteration:
+                break
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.finish_reason is not None:
+                finish_reason = choice.finish_reason
+            if choice.delta.content:
+                parts.append(choice.delta.content)
+                yield encode_stream_frame({'content': choice.delta.content}, stream_format)
+    except asyncio.TimeoutError:
+        latency_tracker.count(tool_id, 'deadline_exceeded')
+        if parts:
+            message = f'{tool_id} did not finish within its {budget:g}s latency budget.'
+        else:
+            message = f'{tool_id} did not start streaming within {first_token_timeout:g}s.'
+        yield encode_stream_frame({'error': message}, stream_format, 'error')
+        return
+    except Exception as e:
+        yield encode_stream_frame({'error': str(e)}, stream_format, 'error')
+        return
+    finally:
+        if stream is not None:
+            await stream.close()
+    
+    if finish_reason == 'stop':
+        await response_cache.put(cache_key, ''.join(parts))
+    yield encode_stream_frame(usage_frame(usage, finish_reason, 'MISS'), stream_format, 'done')
+
+if Request is not None:
+    @app.route(route="utilities/stream", methods=["POST"])
+    async def utilities_stream(req: Request) -> StreamingResponse:
+        try:
+            return await handle_stream(req)
+        except Exception as e:
+            return JSONResponse({'error': str(e)}, status_code=500)
+    
+    async def handle_stream(req):
+        try:
+            data = await req.json()
+        except ValueError:
+            return JSONResponse({'error': 'Invalid JSON body.'}, status_code=400)
+        if not isinstance(data, dict):
+            return JSONResponse({'error': 'Request body must be a JSON object.'}, status_code=400)
+        
+        text = data.get('text', '')
+        tool_id = data.get('tool_id', '')
+        if not isinstance(text, str) or not isinstance(tool_id, str):
+            return JSONResponse({'error': 'text and tool_id must be strings.'}, status_code=400)
+        prompt = resolve_prompt(tool_id, data)
+        
+        if not text.strip():
+            return JSONResponse({'error': 'No text provided.'}, status_code=400)
+        if tool_id in ANALYZERS:
+            return JSONResponse({'error': f'{tool_id} does not support streaming; use /api/utilities.'}, status_code=400)
+        
+        openai_api_key = os.getenv('OPENAI_API_KEY')
+        if not openai_api_key:
+            return JSONResponse({'error': 'OPENAI_API_KEY not set in function app.'}, status_code=500)
+        
+        prompt_tokens, max_tokens = plan_completion(tool_id, prompt, text)
+        if not max_tokens:
+            return JSONResponse({'error': input_too_large_message(prompt_tokens)}, status_code=413)
+        
+        try:
+            await rate_limiter.acquire(prompt_tokens + max_tokens, TOOL_PRIORITIES.get(tool_id, DEFAULT_PRIORITY))
+        except RateLimitExceeded as e:
+            return JSONResponse({'error': str(e)}, status_code=429, headers={'Retry-After': str(e.retry_after)})
+        
+        stream_format = data.get('format')
+        if stream_format not in ('sse', 'ndjson'):
+            accept = req.headers.get('accept', '')
+            stream_format = 'ndjson' if 'application/x-ndjson' in accept else 'sse'
+        media_type = 'application/x-ndjson' if stream_format == 'ndjson' else 'text/event-stream'
+        
+        return StreamingResponse(
+            stream_completion(openai_api_key, tool_id, prompt, text, max_tokens, stream_format),
+            media_type=media_type,
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+startup_timings['module_import_ms'] = round((time.perf_counter() - _import_started) * 1000, 1)
@@ -0,0 +1,318 @@
+# Load-test harness for the utilities route.
+#
+# Starts a local stand-in for the OpenAI chat completions API and drives
+# function_app.utilities in-process (or a running Functions host with --url)
+# at one or more concurrency levels, then reports throughput, latency
+# percentiles and an error breakdown per tool_id. With --stream the LLM tools
+# are streamed through stream_completion (or /api/utilities/stream) instead,
+# and time to first byte is reported as well. No real API calls are made.
+#
+#   python loadtest.py --concurrency 1,16,64 --requests 500
+#   python loadtest.py --tools proofreading,count-analyzer --latency-ms 1500 --error-rate 0.05
+#   python loadtest.py --stream --ttft-ms 400 --token-rate 50
+#   python loadtest.py --url http://localhost:7071/api/utilities   # after `func start`
+#   python loadtest.py --stream --url http://localhost:7071/api/utilities/stream
+#                                         (the host must have OPENAI_BASE_URL set to the
+#                                          printed mock address)
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "the quick brown fox jumps over the lazy dog while editors review long "
+    "articles about readability analysis content strategy and search engine "
+    "optimization for modern publishing teams"
+).split()
+
+class MockSettings:
+    latency_ms = 800.0
+    latency_sigma = 0.5
+    error_rate = 0.0
+    error_kinds = (500, 429)
+    tokens_per_response = 120
+    # Streaming only: median time to the first token and tokens per second
+    # after it; unset, the first token takes a quarter of the latency and the
+    # rest is spread over the tokens
+    first_token_ms = None
+    token_rate = None
+
+def sample_latency(median_ms=None):
+    if median_ms is None:
+        median_ms = MockSettings.latency_ms
+    if MockSettings.latency_sigma <= 0:
+        return median_ms / 1000
+    return random.lognormvariate(0, MockSettings.latency_sigma) * median_ms / 1000
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        if not self.path.endswith('/chat/completions'):
+            self.send_json(404, {'error': {'message': 'not found'}})
+            return
+
+        latency = sample_latency()
+        if random.random() < MockSettings.error_rate:
+            time.sleep(latency / 4)
+            status = random.choice(MockSettings.error_kinds)
+            self.send_json(status, {'error': {'message': f'mock error {status}', 'type': 'mock'}}, {'retry-after': '1'} if status == 429 else None)
+            return
+
+        tokens = [random.choice(WORDS) + ' ' for _ in range(min(MockSettings.tokens_per_response, request.get('max_tokens', 1000)))]
+        usage = {
+            'prompt_tokens': sum(len(m.get('content', '')) for m in request.get('messages', [])) // 4,
+            'completion_tokens': len(tokens),
+            'total_tokens': 0,
+        }
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        base = {'id': 'chatcmpl-mock', 'created': int(time.time()), 'model': request.get('model', 'mock')}
+
+        if not request.get('stream'):
+            time.sleep(latency)
+            self.send_json(200, {
+                **base,
+                'object': 'chat.completion',
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': ''.join(tokens)}, 'finish_reason': 'stop'}],
+                'usage': usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def send_event(payload):
+            data = f'data: {payload}\n\n'.encode('utf-8')
+            self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+            self.wfile.flush()
+
+        if MockSettings.first_token_ms is None:
+            time.sleep(latency / 4)
+        else:
+            time.sleep(sample_latency(MockSettings.first_token_ms))
+        if MockSettings.token_rate:
+            per_token = 1 / MockSettings.token_rate
+        else:
+            per_token = latency * 3 / 4 / max(1, len(tokens))
+        for token in tokens:
+            send_event(json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}]}))
+            time.sleep(per_token)
+        send_event(json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]}))
+        if request.get('stream_options', {}).get('include_usage'):
+            send_event(json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage}))
+        send_event('[DONE]')
+        self.wfile.write(b'0\r\n\r\n')
+
+def start_mock_server(port):
+    server = ThreadingHTTPServer(('127.0.0.1', port), MockOpenAIHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def make_text(rng, words, unique):
+    text = ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+    if unique:
+        # Defeats the response cache and request coalescing
+        text += f' Request {rng.getrandbits(64):x}.'
+    return text
+
+def build_requests(tools, total, words, unique, seed):
+    rng = random.Random(seed)
+    return [
+        (tool_id, {'text': make_text(rng, words, unique), 'tool_id': tool_id, 'options': {}})
+        for tool_id in (tools[i % len(tools)] for i in range(total))
+    ]
+
+async def call_in_process(function_app, body):
+    import azure.functions as func
+    req = func.HttpRequest(
+        method='POST',
+        url='http://localhost/api/utilities',
+        headers={'Content-Type': 'application/json'},
+        body=json.dumps(body).encode('utf-8')
+    )
+    response = await function_app.utilities(req)
+    return response.status_code, None
+
+async def stream_in_process(function_app, body):
+    # Mirrors the checks of the /api/utilities/stream route, which needs the
+    # FastAPI extension to be registered, then consumes stream_completion
+    tool_id, text = body['tool_id'], body['text']
+    prompt = function_app.resolve_prompt(tool_id, body)
+    prompt_tokens, max_tokens = function_app.plan_completion(tool_id, prompt, text)
+    if not max_tokens:
+        return 413, None
+    try:
+        await function_app.rate_limiter.acquire(
+            prompt_tokens + max_tokens,
+            function_app.TOOL_PRIORITIES.get(tool_id, function_app.DEFAULT_PRIORITY)
+        )
+    except function_app.RateLimitExceeded:
+        return 429, None
+    status, first_byte = 200, None
+    frames = function_app.stream_completion(os.environ['OPENAI_API_KEY'], tool_id, prompt, text, max_tokens, 'sse')
+    async for frame in frames:
+        if first_byte is None:
+            first_byte = time.perf_counter()
+        if frame.startswith('event: error'):
+            status = 'stream error'
+    return status, first_byte
+
+def make_http_caller(url, stream):
+    import httpx
+    client = httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=None))
+
+    async def call(body):
+        response = await client.post(url, json=body)
+        return response.status_code, None
+
+    async def call_stream(body):
+        status, first_byte = None, None
+        async with client.stream('POST', url, json=body) as response:
+            status = response.status_code
+            async for chunk in response.aiter_raw():
+                if first_byte is None:
+                    first_byte = time.perf_counter()
+                if b'event: error' in chunk:
+                    status = 'stream error'
+        return status, first_byte
+    return call_stream if stream else call
+
+async def run_level(call, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+
+    async def one(tool_id, body):
+        async with semaphore:
+            started = time.perf_counter()
+            first_byte = None
+            try:
+                status, first_byte = await call(body)
+            except Exception as e:
+                status = type(e).__name__
+            time_to_first_byte = first_byte - started if first_byte is not None else None
+            results.append((tool_id, status, time.perf_counter() - started, time_to_first_byte))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(tool_id, body) for tool_id, body in requests))
+    return results, time.perf_counter() - started
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+def report(concurrency, results, elapsed, stream):
+    print(f'\nconcurrency={concurrency}  requests={len(results)}  elapsed={elapsed:.2f}s  throughput={len(results) / elapsed:.1f} req/s')
+    ttfb_header = f"{'ttfb p50':>10}{'ttfb p95':>10}" if stream else ''
+    print(f"{'tool_id':<28}{'count':>7}{'ok':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}{ttfb_header}  errors")
+    by_tool = defaultdict(list)
+    for tool_id, status, latency, time_to_first_byte in results:
+        by_tool[tool_id].append((status, latency, time_to_first_byte))
+    for tool_id in sorted(by_tool):
+        rows = by_tool[tool_id]
+        latencies = [latency * 1000 for _, latency, _ in rows]
+        errors = Counter(status for status, _, _ in rows if status != 200)
+        ok = sum(1 for status, _, _ in rows if status == 200)
+        ttfb = ''
+        if stream:
+            first_bytes = [value * 1000 for _, _, value in rows if value is not None]
+            ttfb = f'{percentile(first_bytes, 0.5):>10.1f}{percentile(first_bytes, 0.95):>10.1f}'
+        print(
+            f'{tool_id:<28}{len(rows):>7}{ok:>7}{percentile(latencies, 0.5):>10.1f}{percentile(latencies, 0.95):>10.1f}'
+            f'{percentile(latencies, 0.99):>10.1f}{statistics.mean(latencies):>10.1f}{ttfb}  {dict(errors) or "-"}'
+        )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load-test the utilities route against a local OpenAI stand-in.')
+    parser.add_argument('--tools', default='proofreading,paraphrasing,ai-summarizer,tag-recommender,count-analyzer,readability-score')
+    parser.add_argument('--concurrency', default='1,8,32,128', help='comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=200, help='requests per concurrency level')
+    parser.add_argument('--words', type=int, default=300, help='words per request text')
+    parser.add_argument('--repeat-texts', action='store_true', help='reuse texts so the cache and coalescing take effect')
+    parser.add_argument('--latency-ms', type=float, default=800, help='median mock completion latency')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='lognormal spread of the mock latency (0 = fixed)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of mock calls that fail')
+    parser.add_argument('--error-kinds', default='500,429', help='HTTP statuses used for injected failures')
+    parser.add_argument('--tokens', type=int, default=120, help='completion tokens per mock response')
+    parser.add_argument('--stream', action='store_true', help='stream the LLM tools and report time to first byte')
+    parser.add_argument('--ttft-ms', type=float, help='median mock time to first streamed token (default: a quarter of the latency)')
+    parser.add_argument('--token-rate', type=float, help='mock streamed tokens per second (default: the rest of the latency spread over the tokens)')
+    parser.add_argument('--mock-port', type=int, default=0, help='port for the mock server (0 = any free port)')
+    parser.add_argument('--url', help='drive a running Functions host instead of calling utilities in-process')
+    parser.add_argument('--keep-limits', action='store_true', help='keep the outbound rate limiter settings from the environment')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    MockSettings.latency_ms = args.latency_ms
+    MockSettings.latency_sigma = args.latency_sigma
+    MockSettings.error_rate = args.error_rate
+    MockSettings.error_kinds = tuple(int(kind) for kind in args.error_kinds.split(','))
+    MockSettings.tokens_per_response = args.tokens
+    MockSettings.first_token_ms = args.ttft_ms
+    MockSettings.token_rate = args.token_rate
+
+    server = start_mock_server(args.mock_port)
+    mock_url = f'http://127.0.0.1:{server.server_address[1]}/v1'
+    print(f'mock OpenAI API listening on {mock_url}')
+
+    tools = args.tools.split(',')
+    if args.stream:
+        # Same list as ANALYZERS in function_app, which is not imported
+        # when driving a running host
+        skipped = [tool_id for tool_id in tools if tool_id in ('count-analyzer', 'readability-score')]
+        tools = [tool_id for tool_id in tools if tool_id not in skipped]
+        if skipped:
+            print(f"skipping {', '.join(skipped)}: the analyzers do not stream")
+        if not tools:
+            parser.error('--stream needs at least one LLM tool in --tools')
+
+    if args.url:
+        call = make_http_caller(args.url, args.stream)
+    else:
+        # Settings are read when function_app is imported, so set them first
+        os.environ['OPENAI_BASE_URL'] = mock_url
+        os.environ.setdefault('OPENAI_API_KEY', 'loadtest')
+        if not args.keep_limits:
+            os.environ['OPENAI_RPM_LIMIT'] = '0'
+            os.environ['OPENAI_TPM_LIMIT'] = '0'
+        import function_app
+        if args.stream:
+            call = lambda body: stream_in_process(function_app, body)
+        else:
+            call = lambda body: call_in_process(function_app, body)
+
+    for level in (int(level) for level in args.concurrency.split(',')):
+        requests = build_requests(tools, args.requests, args.words, not args.repeat_texts, args.seed + level)
+        results, elapsed = asyncio.run(run_level(call, requests, level))
+        report(level, results, elapsed, args.stream)
+
+    server.shutdown()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+# Server-side copy of the tool prompts in the website's utils/prompts.js;
+# tests/test_prompt_parity.py fails if the two drift apart.
+# Clients send tool_id plus their selections; the system prompt is assembled
+# here so that it is byte-identical for every request to the same tool and
+# options, which keeps response-cache keys stable. (OpenAI's automatic prompt
+# caching only starts at 1,024 prompt tokens and these system prompts are
+# under 100, so the shared prefix only helps there once prompts grow past that.)
+
+SHARED_PREFIX = (
+    "You are the writing assistant behind the Tools360 content tools. "
+    "Apply the instruction below to the text in the user message only, "
+    "and reply with the result without any preamble."
+)
+
+TOOL_PROMPTS = {
+    "proofreading":
+        "Please proofread the following text and identify any spelling errors, grammatical mistakes, and style inconsistencies. Provide a corrected version with explanations for each change:",
+
+    "paraphrasing":
+        "Please paraphrase the following text while maintaining its original meaning but using different words and sentence structures:",
+
+    "ai-humanizer":
+        "Please rewrite the following text to make it more engaging and human-like by adjusting tone, style, and readability:",
+
+    "ai-summarizer":
+        "Please provide a concise summary of the following text while retaining all key information:",
+
+    "outline-generation":
+        "Please generate a structured outline for the following content or topic:",
+
+    "split-sentence":
+        "Please split the following long sentences into shorter, more readable ones to enhance clarity:",
+
+    "table-generator":
+        "Please convert the following content into a well-organized table format:",
+
+    "faq-generator":
+        "Please generate frequently asked questions (FAQs) based on the following content:",
+
+    "glossary-generator":
+        "Please generate a glossary of terms and definitions from the following content:",
+
+    "language-translation":
+        "Please translate the following text into the selected language:",
+
+    "word-choice-optimization":
+        "Please optimize the word choices in the following text to enhance clarity, engagement, and overall quality:",
+
+    "change-tone":
+        "Please change the tone of the following text according to the selected tone:",
+
+    "make-longer-shorter":
+        "Please adjust the length of the following text according to the selected option:",
+
+    "change-voice": {
+        "active":
+            "Please rewrite the following text by converting all passive voice constructions to active voice. Make the subject perform the action directly:",
+        "passive":
+            "Please rewrite the following text by converting all active voice constructions to passive voice. Focus on the action being performed rather than who performs it:",
+    },
+
+    "change-speech": {
+        "direct":
+            "Please rewrite the following text by converting all indirect/reported speech to direct speech using quotation marks and present tense dialogue:",
+        "indirect":
+            "Please rewrite the following text by converting all direct speech to indirect/reported speech, removing quotation marks and using past tense reporting verbs:",
+    },
+
+    "seo-description-generator":
+        "Please generate SEO-friendly meta descriptions for the following content:",
+
+    "tag-recommender":
+        "Please recommend relevant tags for the following content:",
+
+    "title-recommender":
+        "Please recommend catchy and SEO-friendly titles for the following content:",
+}
+
+SELECTION_OPTIONS = {
+    "languages": {
+        "spanish": "Spanish",
+        "french": "French",
+        "german": "German",
+        "italian": "Italian",
+        "portuguese": "Portuguese",
+        "chinese": "Chinese",
+        "japanese": "Japanese",
+        "korean": "Korean",
+        "arabic": "Arabic",
+        "hindi": "Hindi",
+    },
+    "tones": {
+        "professional": "Professional",
+        "friendly": "Friendly",
+        "casual": "Casual",
+        "straightforward": "Straight Forward",
+        "confident": "Confident",
+    },
+    "lengths": {
+        "longer": "Make Longer",
+        "shorter": "Make Shorter",
+    },
+}
+
+def get_prompt_for_tool(tool_id, options=None):
+    # Mirrors getPromptForTool in utils/prompts.js. Unknown option values are
+    # ignored rather than copied into the prompt.
+    options = options or {}
+
+    if tool_id == "language-translation":
+        label = SELECTION_OPTIONS["languages"].get(options.get("language"))
+        if label:
+            return f"Please translate the following text into {label}:"
+        return TOOL_PROMPTS[tool_id]
+
+    if tool_id == "change-tone":
+        label = SELECTION_OPTIONS["tones"].get(options.get("tone"))
+        if label:
+            return f"Please rewrite the following text using a {label} tone:"
+        return TOOL_PROMPTS[tool_id]
+
+    if tool_id == "make-longer-shorter":
+        label = SELECTION_OPTIONS["lengths"].get(options.get("length"))
+        if label:
+            return f"Please {label.lower()} the following text while maintaining its meaning and quality:"
+        return TOOL_PROMPTS[tool_id]
+
+    if tool_id == "change-voice":
+        return TOOL_PROMPTS[tool_id].get(options.get("voice"), "Please change the voice of the following text:")
+
+    if tool_id == "change-speech":
+        return TOOL_PROMPTS[tool_id].get(options.get("speech"), "Please change the speech of the following text:")
+
+    return TOOL_PROMPTS.get(tool_id)
+
+def build_system_prompt(tool_id, options=None):
+    # Returns None for tools the registry does not know about
+    instruction = get_prompt_for_tool(tool_id, options)
+    if instruction is None:
+        return None
+    return f"{SHARED_PREFIX}\n\n{instruction}"
@@ -0,0 +1,84 @@
+# Cold-start report for function_app.
+#
+#   python startup_report.py            # top 25 imports by cumulative time
+#   python startup_report.py --top 50
+#
+# Each measurement runs in a fresh interpreter so nothing is already cached
+# in sys.modules: the import-time breakdown comes from `python -X importtime`,
+# then the time to the first analyzer response and the one-off cost of
+# loading the LLM stack are measured separately.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+FIRST_CALLS = r'''
+import json, time
+started = time.perf_counter()
+import function_app
+imported = time.perf_counter()
+function_app.generate_html_response(function_app.analyze_readability("A first request. It is short."), "readability-score")
+analyzed = time.perf_counter()
+function_app.load_llm_stack()
+loaded = time.perf_counter()
+print(json.dumps({
+    "import function_app": (imported - started) * 1000,
+    "first analyzer response": (analyzed - imported) * 1000,
+    "load openai/httpx (first LLM request)": (loaded - analyzed) * 1000,
+}))
+'''
+
+def run_python(args):
+    here = os.path.dirname(os.path.abspath(__file__))
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=here,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+def import_breakdown(top):
+    result = run_python(['-X', 'importtime', '-c', 'import function_app'])
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Nesting is shown by two extra spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((int(cumulative_us), int(self_us), depth, name.strip()))
+    # A module is listed after everything it imports, and modules loaded at
+    # interpreter startup are level-0 entries too, so function_app's direct
+    # imports are the level-1 rows between the level-0 row before it and its
+    # own row. Listing only those means nothing is counted twice.
+    end = next((i for i, row in enumerate(rows) if row[2] == 0 and row[3] == 'function_app'), None)
+    if end is None:
+        return 0, []
+    start = end
+    while start > 0 and rows[start - 1][2] != 0:
+        start -= 1
+    direct = sorted((row for row in rows[start:end] if row[2] == 1), reverse=True)
+    return rows[end][0], direct[:top]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Report function_app cold-start costs.')
+    parser.add_argument('--top', type=int, default=25, help='number of imports to list')
+    args = parser.parse_args(argv)
+
+    total, rows = import_breakdown(args.top)
+    print(f'import function_app: {total / 1000:.1f} ms cumulative; its direct imports:\n')
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative_us, self_us, _, name in rows:
+        print(f'{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}')
+
+    timings = json.loads(run_python(['-c', FIRST_CALLS]).stdout)
+    print('\nFresh-process timings:')
+    for name, ms in timings.items():
+        print(f'  {name:<40} {ms:8.1f} ms')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
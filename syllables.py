@@ -0,0 +1,132 @@
+# Per-word syllable counts for the readability analyzers.
+#
+# Words are looked up in syllables.bin, a lexicon built from the CMU
+# Pronouncing Dictionary by build_syllable_lexicon.py. It is stored as a
+# sorted array of CRC-32 word hashes with a parallel array of counts: about
+# 600 KB for every dictionary word, where a dict of the same words would take
+# well over 10 MB. Words that are not in the dictionary fall back to the rules
+# in estimate_syllables, except for the rare one (about one in 35,000) whose
+# hash collides with a dictionary word's and so gets that word's count.
+# Results are memoized per word.
+#
+# The dictionary data is Copyright (C) 1993-2015 Carnegie Mellon University
+# and is used under the terms in LICENSE-cmudict.txt.
+
+import array
+import bisect
+import functools
+import logging
+import os
+import re
+import sys
+import zlib
+
+LEXICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'syllables.bin')
+LEXICON_MAGIC = b'SYL1'
+
+_VOWELS = 'aeiouyàáâäèéêëìíîïòóôöùúûü'
+_VOWEL_GROUP_RE = re.compile(f'[{_VOWELS}]+')
+_APOSTROPHE_RE = re.compile("['’]")
+
+# Adjustments for vowel groups that are not one syllable each (after
+# Lingua::EN::Syllable); every match subtracts or adds one.
+_SUBTRACT_RE = re.compile(
+    r'cial|tia|cius|cious|giu|ion|iou|sia$|.ely$|[^td]ed$|(?<![sxzgc])(?<!ch)(?<!sh)es$'
+)
+_ADD_RE = re.compile(
+    r'ia|riet|dien|iu|io|ii|[aeiouym]bl$|[aeiou]{3}|^mc|ism$|(?P<double>[^aeiouy])(?P=double)l$'
+    r'|[^l]lien|^coa[dglx].|[^gq]ua[^auieo]|dnt$'
+)
+
+def estimate_syllables(word):
+    # Rule-based count for a lowercase word; words without vowels (numbers,
+    # the "t" of "don't") have none.
+    if "'" in word or '’' in word:
+        word = _APOSTROPHE_RE.sub('', word)
+    runs = _VOWEL_GROUP_RE.findall(word)
+    groups = len(runs)
+    if groups <= 1 or len(word) <= 3:
+        return groups
+    if word.endswith('e') and not word.endswith(('ee', 'ie', 'ye', 'oe', 'le')):
+        groups -= 1
+    # Most words cannot match either adjustment pattern, and the cheap
+    # tests below rule that out before the patterns are run. Every _ADD_RE
+    # branch needs an "i", "ua", three vowels in a row or one of the fixed
+    # starts and ends; every _SUBTRACT_RE branch an "i" or one of its ends.
+    has_i = 'i' in word
+    if (has_i or 'ua' in word or word.endswith(('l', 'dnt')) or word.startswith(('mc', 'coa'))
+            or max(map(len, runs)) >= 3):
+        groups += len(_ADD_RE.findall(word))
+    if has_i or word.endswith(('ed', 'es', 'ely')):
+        groups -= len(_SUBTRACT_RE.findall(word))
+    return max(1, groups)
+
+def word_hash(word):
+    return zlib.crc32(word.encode('utf-8'))
+
+# The top bits of a hash select a bucket; bucket i holds the entries from
+# offsets[i] to offsets[i + 1], so a lookup bisects a few dozen entries
+# instead of the whole table
+_BUCKET_SHIFT = 20
+_BUCKETS = 1 << (32 - _BUCKET_SHIFT)
+
+def _read_array(f, typecode, size):
+    values = array.array(typecode)
+    values.fromfile(f, size)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+def _write_array(f, values):
+    if sys.byteorder == 'big':
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    values.tofile(f)
+
+def load_lexicon(path=LEXICON_PATH):
+    with open(path, 'rb') as f:
+        if f.read(4) != LEXICON_MAGIC:
+            raise ValueError(f'{path} is not a syllable lexicon')
+        size = int.from_bytes(f.read(4), 'little')
+        offsets = _read_array(f, 'I', _BUCKETS + 1)
+        hashes = _read_array(f, 'I', size)
+        counts = _read_array(f, 'B', size)
+    return offsets, hashes, counts
+
+def save_lexicon(entries, path=LEXICON_PATH):
+    # entries: iterable of (hash, count) pairs with unique hashes
+    entries = sorted(entries)
+    hashes = array.array('I', (h for h, _ in entries))
+    counts = array.array('B', (count for _, count in entries))
+    offsets = array.array('I', (
+        bisect.bisect_left(hashes, bucket << _BUCKET_SHIFT) for bucket in range(_BUCKETS)
+    ))
+    offsets.append(len(hashes))
+    with open(path, 'wb') as f:
+        f.write(LEXICON_MAGIC)
+        f.write(len(entries).to_bytes(4, 'little'))
+        _write_array(f, offsets)
+        _write_array(f, hashes)
+        _write_array(f, counts)
+
+try:
+    _offsets, _hashes, _counts = load_lexicon()
+except FileNotFoundError:
+    logging.warning('%s not found; syllables are estimated by rules alone, which is less accurate.', LEXICON_PATH)
+    _offsets, _hashes, _counts = array.array('I', [0] * (_BUCKETS + 1)), array.array('I'), array.array('B')
+
+def lexicon_syllables(word):
+    h = word_hash(word)
+    bucket = h >> _BUCKET_SHIFT
+    end = _offsets[bucket + 1]
+    index = bisect.bisect_left(_hashes, h, _offsets[bucket], end)
+    if index < end and _hashes[index] == h:
+        return _counts[index]
+    return None
+
+@functools.lru_cache(maxsize=16384)
+def count_word_syllables(word):
+    # word must already be lowercase; the lexicon spells contractions with
+    # a straight apostrophe
+    count = lexicon_syllables(word.replace('’', "'") if '’' in word else word)
+    return estimate_syllables(word) if count is None else count
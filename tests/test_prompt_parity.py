@@ -0,0 +1,59 @@
+import json
+import os
+import re
+
+import pytest
+
+from prompts import SELECTION_OPTIONS, SHARED_PREFIX, TOOL_PROMPTS, get_prompt_for_tool
+
+PROMPTS_JS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'Tools360 AI Website (Main)', 'utils', 'prompts.js'
+)
+
+_STRING_RE = re.compile(r'"((?:[^"\\]|\\.)*)"')
+_BARE_KEY_RE = re.compile(r'(^|[{,])(\s*)([A-Za-z_]\w*)\s*:', re.MULTILINE)
+_TRAILING_COMMA_RE = re.compile(r',(\s*[}\]])')
+
+with open(PROMPTS_JS, encoding='utf-8') as f:
+    SOURCE = f.read()
+
+def js_declaration(name):
+    # The text of `export const <name> = ...;` up to the closing brace
+    match = re.search(rf'export const {name} =(.*?)\n}};', SOURCE, re.DOTALL)
+    return match.group(1) + '\n}'
+
+def js_object(name):
+    # The prompt objects are JSON apart from bare keys and trailing commas
+    literal = _BARE_KEY_RE.sub(r'\1\2"\3":', js_declaration(name))
+    return json.loads(_TRAILING_COMMA_RE.sub(r'\1', literal))
+
+def test_shared_prefix_matches():
+    declaration = re.search(r'export const sharedPrefix =(.*?);', SOURCE, re.DOTALL).group(1)
+    assert ''.join(json.loads(f'"{part}"') for part in _STRING_RE.findall(declaration)) == SHARED_PREFIX
+
+def test_tool_prompts_match():
+    assert js_object('toolPrompts') == TOOL_PROMPTS
+
+def test_selection_options_match():
+    options = js_object('selectionOptions')
+    for name, labels in SELECTION_OPTIONS.items():
+        assert {option['value']: option['label'] for option in options[name]} == labels
+    assert [option['value'] for option in options['voices']] == list(TOOL_PROMPTS['change-voice'])
+    assert [option['value'] for option in options['speeches']] == list(TOOL_PROMPTS['change-speech'])
+
+@pytest.mark.parametrize('tool_id, option, labels', [
+    ('language-translation', 'language', 'languages'),
+    ('change-tone', 'tone', 'tones'),
+    ('make-longer-shorter', 'length', 'lengths')
+])
+def test_selection_templates_match(tool_id, option, labels):
+    case = SOURCE[SOURCE.index(f'case "{tool_id}":'):]
+    template = re.search(r'return `([^`]*)`', case).group(1)
+    for value, label in SELECTION_OPTIONS[labels].items():
+        expected = re.sub(
+            r'\$\{\w+(\.toLowerCase\(\))?\}',
+            lambda m: label.lower() if m.group(1) else label,
+            template
+        )
+        assert get_prompt_for_tool(tool_id, {option: value}) == expected
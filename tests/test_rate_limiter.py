@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+import pytest
+
+from function_app import RateLimiter, RateLimitExceeded, parse_latency_budgets
+
+async def queue_one(limiter, tokens):
+    waiter = asyncio.ensure_future(limiter.acquire(tokens))
+    await asyncio.sleep(0)
+    assert len(limiter.queue) == 1
+    return waiter
+
+def test_projected_wait_refills_buckets_while_requests_are_queued():
+    async def scenario():
+        limiter = RateLimiter(60, 0, max_queue=10, max_wait=1.5)
+        limiter.requests.level = 0
+        limiter.requests.updated = time.monotonic()
+        waiter = await queue_one(limiter, 0)
+        
+        # 0.9s later the bucket holds 0.9 requests, so two requests need 1.1s
+        # more; without the refill the projection would be 2s, over max_wait
+        limiter.requests.updated -= 0.9
+        assert limiter._projected_wait(0, time.monotonic()) == pytest.approx(1.1, abs=0.05)
+        second = asyncio.ensure_future(limiter.acquire(0))
+        await asyncio.sleep(0)
+        assert len(limiter.queue) == 2
+        
+        for future in (waiter, second):
+            future.cancel()
+        await asyncio.gather(waiter, second, return_exceptions=True)
+    
+    asyncio.run(scenario())
+
+def test_projected_wait_counts_at_most_a_full_bucket_per_request():
+    async def scenario():
+        limiter = RateLimiter(0, 600, max_queue=10, max_wait=60)
+        limiter.tokens.level = 0
+        limiter.tokens.updated = time.monotonic()
+        waiter = await queue_one(limiter, 5000)
+        
+        # Each request waits for at most a full bucket of 600 tokens
+        assert limiter._projected_wait(5000, time.monotonic()) == pytest.approx(120, abs=0.5)
+        with pytest.raises(RateLimitExceeded) as rejected:
+            await limiter.acquire(5000)
+        assert rejected.value.retry_after == 120
+        
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+    
+    asyncio.run(scenario())
+
+@pytest.mark.parametrize('raw', ['{"ai-summarizer": 90', '[90]', '{"ai-summarizer": "90"}', '{"ai-summarizer": 0}'])
+def test_malformed_latency_budgets_fall_back_to_defaults(raw):
+    assert parse_latency_budgets(raw) == {}
+
+def test_latency_budget_overrides_are_parsed():
+    assert parse_latency_budgets('{"ai-summarizer": 90, "tag-recommender": 7.5}') == {'ai-summarizer': 90, 'tag-recommender': 7.5}
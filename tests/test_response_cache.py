@@ -0,0 +1,84 @@
+import asyncio
+import os
+
+from function_app import ResponseCache
+
+def make_cache(tmp_path=None, max_entries=10, max_bytes=1000, ttl=60, disk_max_bytes=0):
+    disk_dir = str(tmp_path) if tmp_path is not None else ''
+    cache = ResponseCache(max_entries, max_bytes, ttl, disk_dir, disk_max_bytes)
+    if disk_dir:
+        assert cache.disk_ready.wait(5)
+    return cache
+
+def test_get_misses_then_hits_after_put():
+    async def scenario():
+        cache = make_cache()
+        assert await cache.get('k1') is None
+        await cache.put('k1', 'value')
+        assert await cache.get('k1') == 'value'
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses']) == (1, 1)
+
+    asyncio.run(scenario())
+
+def test_expired_entries_miss():
+    async def scenario():
+        cache = make_cache(ttl=-1)
+        await cache.put('k1', 'value')
+        assert await cache.get('k1') is None
+        assert cache.stats()['expired'] == 1
+
+    asyncio.run(scenario())
+
+def test_memory_tier_evicts_least_recently_used():
+    async def scenario():
+        cache = make_cache(max_entries=2)
+        await cache.put('k1', 'one')
+        await cache.put('k2', 'two')
+        assert await cache.get('k1') == 'one'
+        await cache.put('k3', 'three')
+        assert await cache.get('k2') is None
+        assert await cache.get('k1') == 'one'
+        assert await cache.get('k3') == 'three'
+        assert cache.stats()['evictions'] == 1
+
+    asyncio.run(scenario())
+
+def test_memory_tier_evicts_by_bytes():
+    async def scenario():
+        cache = make_cache(max_bytes=10)
+        await cache.put('k1', 'x' * 6)
+        await cache.put('k2', 'y' * 6)
+        assert await cache.get('k1') is None
+        assert cache.stats()['bytes'] == 6
+
+    asyncio.run(scenario())
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    async def scenario():
+        cache = make_cache(tmp_path, disk_max_bytes=10000)
+        await cache.put('ab12', 'persisted')
+
+        # A fresh instance stands in for a host restart: the startup index
+        # finds the file and the read is served from disk
+        restarted = make_cache(tmp_path, disk_max_bytes=10000)
+        assert restarted.stats()['disk_entries'] == 1
+        assert await restarted.get('ab12') == 'persisted'
+        assert restarted.stats()['disk_hits'] == 1
+        assert await restarted.get('ab12') == 'persisted'
+        assert restarted.stats()['hits'] == 1
+
+    asyncio.run(scenario())
+
+def test_disk_tier_evicts_oldest_files_over_budget(tmp_path):
+    async def scenario():
+        cache = make_cache(tmp_path, disk_max_bytes=120)
+        for key in ('aa01', 'aa02', 'aa03'):
+            await cache.put(key, 'v' * 20)
+        stats = cache.stats()
+        assert stats['disk_evictions'] >= 1
+        assert stats['disk_bytes'] <= 120
+        assert not os.path.exists(cache._disk_path('aa01'))
+        assert os.path.exists(cache._disk_path('aa03'))
+
+    asyncio.run(scenario())
@@ -0,0 +1,53 @@
+import asyncio
+import json
+import re
+
+import azure.functions as func
+import pytest
+
+import function_app
+
+def post(route, handler, body, accept='text/html'):
+    req = func.HttpRequest(
+        'POST',
+        f'http://localhost:7071/api/{route}',
+        headers={'Content-Type': 'application/json', 'Accept': accept},
+        body=json.dumps(body).encode('utf-8')
+    )
+    return asyncio.run(handler(req))
+
+def stylesheet_link(response):
+    return re.search(r'<link rel="stylesheet" href="[^"]*">', response.get_body().decode('utf-8')).group(0)
+
+def test_session_and_utilities_link_the_same_stylesheet():
+    text = 'The cat sat on the mat. It was happy.'
+    utilities = post('utilities', function_app.utilities, {'tool_id': 'readability-score', 'text': text})
+    session = post('utilities/session', function_app.utilities_session, {
+        'document_id': 'stylesheet', 'tool_id': 'readability-score', 'text': text
+    })
+    assert utilities.status_code == session.status_code == 200
+    link = stylesheet_link(session)
+    assert link == stylesheet_link(utilities)
+    assert 'href="http://localhost:7071/api/utilities/analyzer.css?v=' in link
+
+def test_session_rejects_blank_text_like_utilities():
+    body = {'document_id': 'blank', 'tool_id': 'count-analyzer', 'text': '  \n '}
+    utilities = post('utilities', function_app.utilities, body, 'application/json')
+    session = post('utilities/session', function_app.utilities_session, body, 'application/json')
+    assert session.status_code == utilities.status_code == 400
+    assert json.loads(session.get_body()) == json.loads(utilities.get_body()) == {'error': 'No text provided.'}
+
+@pytest.mark.parametrize('change', [
+    {'start': True, 'insert': ['x']},
+    {'start': 0, 'delete': False, 'insert': ['x']}
+])
+def test_parse_changes_rejects_booleans(change):
+    with pytest.raises(ValueError):
+        function_app.parse_changes([change])
+
+@pytest.mark.parametrize('output_format', [5, ['json'], 'yaml'])
+def test_unsupported_formats_are_not_acceptable(output_format):
+    body = {'document_id': 'format', 'tool_id': 'count-analyzer', 'text': 'One two.', 'format': output_format}
+    utilities = post('utilities', function_app.utilities, body, 'application/json')
+    session = post('utilities/session', function_app.utilities_session, body, 'application/json')
+    assert utilities.status_code == session.status_code == 406
@@ -0,0 +1,33 @@
+import function_app
+
+def streamed(text, piece_size):
+    stats = function_app.StreamingTextStats()
+    for start in range(0, len(text), piece_size):
+        stats.feed(text[start:start + piece_size])
+        assert len(stats.carry) <= function_app._MAX_CARRY
+    return stats.result()
+
+def one_shot(text):
+    stats = function_app.StreamingTextStats()
+    stats.feed(text)
+    stats.feed('')
+    return stats.result()
+
+def test_streamed_counts_match_for_text_without_whitespace():
+    text = '这是一个没有空格的中文句子。' * 2000 + ' https://example.com/' + 'a/b-c_d?' * 3000 + ' done.'
+    assert streamed(text, 1000) == one_shot(text)
+
+def test_word_cut_at_the_carry_limit_is_counted_once():
+    text = 'x' * (function_app._MAX_CARRY * 3) + ' end.'
+    result = streamed(text, 1000)
+    assert result['words'] == 2
+    assert result['characters'] == len(text) - 1
+
+def test_analyzer_output_keeps_index_inputs_private():
+    text = 'Readability indices need polysyllabic words.\n\nThey stay internal.'
+    content = function_app.analyze_content(text)
+    readability = function_app.analyze_readability(text)
+    assert list(content) == ['words', 'sentences', 'characters', 'paragraphs', 'syllables', 'reading_time', 'speaking_time']
+    for name in ('polysyllables', 'complex_words', 'letters'):
+        assert name not in content and name not in readability
+    assert readability['gunning_fog'] > 0
@@ -0,0 +1,35 @@
+import asyncio
+import json
+
+import azure.functions as func
+
+import function_app
+
+CHINESE = '自然语言处理是人工智能的一个重要分支，它研究如何让计算机理解和生成人类语言。'
+
+def test_cjk_text_counts_about_one_token_per_character():
+    text = CHINESE * 100
+    assert function_app.estimate_tokens(text) >= len(text)
+
+def test_english_estimate_is_unchanged():
+    text = 'The quick brown fox jumps over the lazy dog. ' * 100
+    assert function_app.estimate_tokens(text) == max(
+        -(-function_app.count_words(text) * 4 // 3), -(-len(text) // 4)
+    )
+
+def test_oversized_cjk_input_is_rejected_before_any_upstream_call(monkeypatch):
+    text = CHINESE * 11000
+    assert function_app.plan_completion('paraphrasing', 'prompt', text)[1] == 0
+    
+    async def no_upstream(*args):
+        raise AssertionError('an oversized input reached the upstream call')
+    monkeypatch.setattr(function_app, 'cached_completion', no_upstream)
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    req = func.HttpRequest(
+        'POST',
+        'http://localhost:7071/api/utilities',
+        headers={'Content-Type': 'application/json'},
+        body=json.dumps({'tool_id': 'paraphrasing', 'text': text}).encode('utf-8')
+    )
+    response = asyncio.run(function_app.utilities(req))
+    assert response.status_code == 413